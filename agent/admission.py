@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import math
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Iterator, Optional
+
+from .metrics import REGISTRY
+
+
+ADMISSION_METRIC = "admission_rejected_total"
+
+# Monotonic deadline of the request being served. Like the timing breakdown in
+# ``metrics``, it is inherited by the tasks spawned while serving the request.
+_request_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class Overloaded(Exception):
+    """Raised instead of queueing work that cannot be served in time.
+
+    ``status_code`` is 429 when the wait queue is full and 503 when the
+    request's deadline would be missed; ``retry_after`` is a hint in seconds.
+    """
+
+    def __init__(self, message: str, status_code: int, retry_after: int) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(Overloaded):
+    """Raised when the request's deadline passes while its work is running (504).
+
+    The work was given up on because the caller ran out of time, not because
+    a backend misbehaved, so nothing is restarted.
+    """
+
+    def __init__(self, message: str) -> None:
+        super().__init__(message, 504, 1)
+
+
+@contextmanager
+def request_deadline(seconds: Optional[float]) -> Iterator[None]:
+    """Give the work done in this context ``seconds`` to finish (``None``: no limit)."""
+    deadline = None if seconds is None else time.monotonic() + seconds
+    token = _request_deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _request_deadline.reset(token)
+
+
+def remaining_time() -> Optional[float]:
+    """Seconds left until the current request's deadline, if it has one."""
+    deadline = _request_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def context_without_deadline() -> contextvars.Context:
+    """A copy of the current context (timing breakdown included) without a deadline."""
+    context = contextvars.copy_context()
+    context.run(_request_deadline.set, None)
+    return context
+
+
+class AdmissionController:
+    """Bounds how much work runs at once and how much may wait for a slot.
+
+    At most ``max_concurrency`` holders run; up to ``max_queue`` more wait.
+    Anything beyond that, and any request whose deadline would pass before a
+    slot is expected to free up, is rejected with ``Overloaded`` right away.
+    The expected wait is estimated from a moving average of hold times.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int) -> None:
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._average_hold = 0.0
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+
+    def _expected_wait(self, ahead: int) -> float:
+        return self._average_hold * (ahead + 1) / self.max_concurrency
+
+    def _reject(self, message: str, status_code: int, reason: str) -> Overloaded:
+        self.rejected += 1
+        REGISTRY.inc(ADMISSION_METRIC, scope=self.name, reason=reason)
+        retry_after = max(1, math.ceil(self._expected_wait(self.waiting)))
+        return Overloaded(f"{self.name}: {message}", status_code, retry_after)
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[None]:
+        remaining = remaining_time()
+        if remaining is not None and remaining <= 0:
+            raise self._reject("request deadline has passed", 503, "deadline")
+        if self._semaphore.locked():
+            if self.waiting >= self.max_queue:
+                raise self._reject("too many requests waiting", 429, "queue_full")
+            if remaining is not None and self._expected_wait(self.waiting) > remaining:
+                raise self._reject("request deadline would be missed", 503, "deadline")
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), remaining)
+        except TimeoutError:
+            raise self._reject("request deadline passed while queued", 503, "deadline") from None
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+            held = time.monotonic() - started
+            self._average_hold = held if not self._average_hold else 0.8 * self._average_hold + 0.2 * held
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+# Actions whose answer depends only on the decision and the catalog contents.
+CACHEABLE_ACTIONS = frozenset(
+    {"list_products", "list_products_by_price", "get_statistics", "get_product", "discount", "search_products"}
+)
+
+# Plain catalog reads: their answer is fixed by the decision and the catalog
+# version, so it can be validated with an ETag before running the graph.
+# Writes and computed answers (discounts) never get a 304.
+CONDITIONAL_ACTIONS = frozenset(
+    {"list_products", "list_products_by_price", "get_statistics", "get_product", "search_products"}
+)
+
+
+def decision_key(decision: Dict[str, Any]) -> str:
+    """Normalize a parsed decision into a cache key."""
+    return json.dumps(decision, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+
+class ResponseCache:
+    """LRU cache of agent responses with TTL and catalog-version invalidation.
+
+    Entries remember the catalog version they were computed against; a lookup
+    with a different version is a miss and drops the stale entry.
+    """
+
+    def __init__(self, max_size: int = 256, ttl: float = 30.0) -> None:
+        self._max_size = max_size
+        self._ttl = ttl
+        self._entries: OrderedDict[str, tuple[Optional[str], float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["ResponseCache"]:
+        max_size = int(os.getenv("AGENT_CACHE_SIZE", "256"))
+        if max_size <= 0:
+            return None
+        return cls(max_size=max_size, ttl=float(os.getenv("AGENT_CACHE_TTL", "30")))
+
+    def get(self, key: str, version: Optional[str]) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry_version, expires_at, value = entry
+            if entry_version == version and time.monotonic() < expires_at:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key: str, version: Optional[str], value: Any) -> None:
+        self._entries[key] = (version, time.monotonic() + self._ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self._max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
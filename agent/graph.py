@@ -1,15 +1,45 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import inspect
 import json
 import logging
-from typing import Any, Dict, List, Optional, TypedDict
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    TypedDict,
+)
 
 from langgraph.graph import END, StateGraph
 from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig
 
+from .admission import AdmissionController, Overloaded
+from .cache import CACHEABLE_ACTIONS, CONDITIONAL_ACTIONS, ResponseCache, decision_key
 from .mock_llm import MockLLM
-from .mcp_client import MCPClient
-from .tools import calculator, format_products, formatter
+from .mcp_client import BatchToolCalls, MCPClient
+from .metrics import REGISTRY
+from .startup import STARTUP
+from .tools import (
+    DISCOUNT_EXPRESSION,
+    EMPTY_PRODUCTS_MESSAGE,
+    apply_discount,
+    calculator,
+    format_products,
+    formatter,
+    iter_format_products,
+)
 
 
 class AgentState(TypedDict, total=False):
@@ -19,28 +49,301 @@ class AgentState(TypedDict, total=False):
     tools_used: List[str]
     response: str
     error: str
+    cache_key: str
+    catalog_version: Optional[str]
+    cached: bool
 
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_BATCH_CONCURRENCY = int(os.getenv("AGENT_BATCH_CONCURRENCY", "8"))
+DEFAULT_STREAM_PAGE_SIZE = int(os.getenv("AGENT_STREAM_PAGE_SIZE", "200"))
+# IDs per get_products call when a discount covers many products; the calls
+# run concurrently on the MCP session pool.
+DISCOUNT_FETCH_CHUNK = 100
+# Decision fields passed through to the list_products tool when set.
+LISTING_ARGUMENTS = ("category", "in_stock")
+# Decision fields passed through to the list_products_by_price tool when set.
+PRICE_QUERY_ARGUMENTS = ("min_price", "max_price", "category", "in_stock", "order", "limit")
+DEFAULT_IMPORT_CHUNK_SIZE = int(os.getenv("AGENT_IMPORT_CHUNK_SIZE", "5000"))
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("AGENT_MAX_CONCURRENCY", "32"))
+DEFAULT_MAX_QUEUE = int(os.getenv("AGENT_MAX_QUEUE", "128"))
+# One query per action (and per branch of discount), run by ``AgentRunner.prewarm``.
+# The listing asks for a category nobody uses, so the whole catalog is not formatted.
+PREWARM_QUERIES = (
+    "Товар id 1",
+    "Какая средняя цена продуктов?",
+    "Какая средняя цена в категории Электроника?",
+    "Найди ноутбук",
+    "3 самых дорогих товара",
+    "Покажи продукты категории Прогрев",
+    "Посчитай скидку 10% на товар с ID 1",
+    "Скидка 10% на ID 1, 2",
+    "Добавь новый продукт: Прогрев, цена 1, категория Прогрев",
+    "Привет",
+)
+# Cheap read-only calls that make every pooled server session handle each tool once.
+PREWARM_TOOL_CALLS = (
+    ("get_catalog_version", {}),
+    ("get_product", {"product_id": 1}),
+    ("get_products", {"product_ids": [1]}),
+    ("list_products", {"limit": 1}),
+    ("list_products_by_price", {"limit": 1}),
+    ("search_products", {"text": "прогрев", "limit": 1}),
+    ("get_statistics", {}),
+)
+
+NODE_METRIC = "agent_node_duration_seconds"
+REQUEST_METRIC = "agent_request_duration_seconds"
+REQUESTS_METRIC = "agent_requests_total"
+CACHE_METRIC = "agent_cache_lookups_total"
+
+
+def _timed_node(name: str, node: Callable[..., Awaitable[AgentState]]) -> Callable[..., Awaitable[AgentState]]:
+    """Wrap a graph node so its latency is recorded under ``NODE_METRIC``."""
+    takes_config = "config" in inspect.signature(node).parameters
+
+    async def timed(state: AgentState, config: RunnableConfig) -> AgentState:
+        with REGISTRY.time(NODE_METRIC, node=name):
+            return await (node(state, config) if takes_config else node(state))
+
+    return timed
+
 
 class AgentRunner:
-    def __init__(self, app) -> None:
+    def __init__(
+        self,
+        app,
+        mcp_client: Optional[MCPClient] = None,
+        cache: Optional[ResponseCache] = None,
+        decide: Optional[Callable[[str], Awaitable[Dict[str, Any]]]] = None,
+        page_size: int = DEFAULT_STREAM_PAGE_SIZE,
+        admission: Optional[AdmissionController] = None,
+    ) -> None:
         self._app = app
+        self._mcp_client = mcp_client
+        self._cache = cache
+        self._decide = decide
+        self._page_size = max(1, page_size)
+        self.admission = admission or AdmissionController("graph", DEFAULT_MAX_CONCURRENCY, DEFAULT_MAX_QUEUE)
+
+    def admission_stats(self) -> dict:
+        stats = {"graph": self.admission.stats()}
+        if isinstance(self._mcp_client, MCPClient):
+            stats["mcp"] = self._mcp_client.admission.stats()
+        return stats
+
+    def cache_stats(self) -> dict:
+        if self._cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **self._cache.stats()}
 
-    async def run(self, query: str) -> dict:
-        state = await self._app.ainvoke({"query": query})
+    async def start(self) -> None:
+        if self._mcp_client is not None:
+            await self._mcp_client.start()
+
+    async def aclose(self) -> None:
+        if self._mcp_client is not None:
+            await self._mcp_client.aclose()
+
+    async def prewarm(self, queries: Sequence[str] = PREWARM_QUERIES) -> None:
+        """Run each action once so the first real requests do not pay for cold paths.
+
+        Every pooled MCP session is sent each read-only tool, then the queries
+        run through the graph without admission control or request metrics.
+        Writes are only parsed, never executed. Failures are logged: a path
+        that could not be warmed is no reason to refuse traffic.
+        """
+        if isinstance(self._mcp_client, MCPClient):
+            with STARTUP.phase("prewarm MCP sessions"):
+                for name, arguments in PREWARM_TOOL_CALLS:
+                    try:
+                        await self._mcp_client.call_tool_on_all(name, arguments)
+                    except Exception:  # noqa: BLE001
+                        logger.warning("Could not prewarm tool %s", name, exc_info=True)
+        for query in queries:
+            decision = await self._decide(query) if self._decide else {}
+            action = decision.get("action", "unknown")
+            with STARTUP.phase(f"prewarm {action}"):
+                if action == "add_product":
+                    continue
+                try:
+                    await self._app.ainvoke({"query": query})
+                except Exception:  # noqa: BLE001
+                    logger.warning("Could not prewarm query %r", query, exc_info=True)
+
+    async def server_metrics(self) -> List[dict]:
+        """Metric snapshots of every MCP server process (store operations)."""
+        if self._mcp_client is None or self._mcp_client.in_process:
+            # An in-process server records into this process's registry.
+            return []
+        return await self._mcp_client.call_tool_on_all("get_metrics", {})
+
+    async def etag(self, query: str) -> Optional[str]:
+        """Entity tag of the answer to ``query``, known without running the graph.
+
+        It is derived from the parsed decision and the catalog version, so it
+        is only given for catalog reads (``CONDITIONAL_ACTIONS``); ``None``
+        otherwise, or when the version cannot be read.
+        """
+        if self._decide is None or self._mcp_client is None:
+            return None
+        decision = await self._decide(query)
+        if decision.get("action") not in CONDITIONAL_ACTIONS:
+            return None
+        try:
+            version = (await self._mcp_client.call_tool("get_catalog_version", {})).get("version")
+        except Overloaded:
+            raise
+        except Exception:  # noqa: BLE001
+            logger.exception("Could not read catalog version, answering without an ETag")
+            return None
+        digest = hashlib.sha1(f"{version}\n{decision_key(decision)}".encode("utf-8")).hexdigest()
+        return f'"{digest}"'
+
+    async def run(self, query: str, config: Optional[RunnableConfig] = None) -> dict:
+        """Run the graph for one query.
+
+        Raises:
+            Overloaded: If no graph slot (or MCP call slot) can be had in time.
+        """
+        async with self.admission.admit():
+            return await self._run(query, config)
+
+    async def _run(self, query: str, config: Optional[RunnableConfig]) -> dict:
+        started = time.perf_counter()
+        action = "error"
+        try:
+            state = await self._app.ainvoke({"query": query}, config=config)
+            action = state.get("decision", {}).get("action", "unknown")
+        finally:
+            REGISTRY.observe(REQUEST_METRIC, time.perf_counter() - started, action=action)
+            REGISTRY.inc(REQUESTS_METRIC, action=action)
         return {
             "response": state.get("response", ""),
             "tools_used": state.get("tools_used", []),
         }
 
+    async def run_batch(self, queries: List[str], concurrency: Optional[int] = None) -> List[dict]:
+        """Run queries concurrently, sharing identical read-only tool calls.
+
+        Results are returned in input order; a failing query yields an item
+        with an ``error`` key instead of failing the batch.
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency or DEFAULT_BATCH_CONCURRENCY))
+        config: RunnableConfig = {"configurable": {"mcp_client": BatchToolCalls(self._mcp_client)}}
+
+        async def run_one(query: str) -> dict:
+            async with semaphore:
+                try:
+                    return await self.run(query, config=config)
+                except Exception as exc:  # noqa: BLE001
+                    logger.exception("Batch item failed: %s", query)
+                    return {"error": str(exc)}
+
+        return list(await asyncio.gather(*(run_one(query) for query in queries)))
+
+    async def stream(self, query: str) -> AsyncIterator[dict]:
+        """Yield the response as ``line`` events followed by a ``done`` event.
+
+        Product listings are paged out of the MCP server and formatted page by
+        page, so memory stays bounded and the first lines arrive immediately.
+        Other actions run through the graph and are split into lines.
+        """
+        decision = await self._decide(query) if self._decide and self._mcp_client else {}
+        if decision.get("action") == "list_products":
+            async with self.admission.admit():
+                async for page in self._product_pages(decision):
+                    for line in iter_format_products(page):
+                        yield {"type": "line", "text": line}
+            yield {"type": "done", "tools_used": ["list_products"]}
+            return
+
+        result = await self.run(query)
+        for line in result["response"].splitlines():
+            yield {"type": "line", "text": line}
+        yield {"type": "done", "tools_used": result["tools_used"]}
+
+    async def import_products(self, items: AsyncIterable[dict], chunk_size: Optional[int] = None) -> dict:
+        """Add products through the bulk ``add_products`` tool, one chunk per call.
+
+        Each chunk is validated and persisted as a whole. Chunks are committed
+        in order, so when one is rejected the earlier ones stay in the catalog.
+        All chunks go through one MCP session, so only the server process
+        doing the import keeps its indexes current chunk by chunk.
+
+        Raises:
+            ValueError: If a chunk is rejected; the message says how many
+                products had been added before it.
+        """
+        chunk_size = max(1, chunk_size or DEFAULT_IMPORT_CHUNK_SIZE)
+        added = chunks = 0
+        chunk: List[dict] = []
+
+        async def flush(client: Any) -> None:
+            nonlocal added, chunks
+            result = await client.call_tool("add_products", {"items": chunk})
+            if not isinstance(result, dict) or "added" not in result:
+                raise ValueError(
+                    f"Chunk starting at item {added} was rejected, {added} products were added: {result}"
+                )
+            added += result["added"]
+            chunks += 1
+            chunk.clear()
+
+        async with self._pinned_tools() as client:
+            async for item in items:
+                chunk.append(item)
+                if len(chunk) >= chunk_size:
+                    await flush(client)
+            if chunk:
+                await flush(client)
+        logger.info("Imported %s products in %s chunks", added, chunks)
+        return {"added": added, "chunks": chunks}
+
+    @asynccontextmanager
+    async def _pinned_tools(self) -> AsyncIterator[Any]:
+        if isinstance(self._mcp_client, MCPClient):
+            async with self._mcp_client.pinned() as client:
+                yield client
+        else:
+            yield self._mcp_client
+
+    async def _product_pages(self, decision: Dict[str, Any]) -> AsyncIterator[List[dict]]:
+        arguments: Dict[str, Any] = {
+            key: decision[key] for key in LISTING_ARGUMENTS if decision.get(key) is not None
+        }
+        arguments["limit"] = self._page_size
+        while True:
+            page = await self._mcp_client.call_tool("list_products", arguments)
+            if page or "after_id" not in arguments:
+                yield page
+            if len(page) < self._page_size:
+                return
+            # Continue after the last product: the store seeks there instead of skipping an offset.
+            arguments = {**arguments, "after_id": page[-1]["id"]}
+
 
-def build_agent(mcp_client: Optional[MCPClient] = None, llm: Optional[MockLLM] = None) -> AgentRunner:
+def build_agent(
+    mcp_client: Optional[MCPClient] = None,
+    llm: Optional[MockLLM] = None,
+    cache: Optional[ResponseCache] = None,
+) -> AgentRunner:
     llm = llm or MockLLM()
     mcp_client = mcp_client or MCPClient()
+    cache = cache if cache is not None else ResponseCache.from_env()
+
+    def tools(config: Optional[RunnableConfig]) -> MCPClient:
+        # Batches route tool calls through their own deduplicating client.
+        return ((config or {}).get("configurable") or {}).get("mcp_client") or mcp_client
 
     async def analyze(state: AgentState) -> AgentState:
+        if isinstance(llm, MockLLM):
+            # The mock produces the decision directly; skip encoding it as a message.
+            decision = llm.decide(state["query"])
+            logger.info("Agent decision: %s", decision)
+            return {"decision": decision}
+
         message = HumanMessage(content=state["query"])
         llm_response = llm.invoke([message])
         decision: Dict[str, Any] = {"action": "unknown"}
@@ -54,7 +357,36 @@ def build_agent(mcp_client: Optional[MCPClient] = None, llm: Optional[MockLLM] =
         logger.info("Agent decision: %s", decision)
         return {"decision": decision}
 
-    async def execute(state: AgentState) -> AgentState:
+    async def check_cache(state: AgentState, config: RunnableConfig) -> AgentState:
+        decision = state.get("decision", {})
+        if cache is None or decision.get("action") not in CACHEABLE_ACTIONS:
+            return {}
+        try:
+            version = (await tools(config).call_tool("get_catalog_version", {})).get("version")
+        except Overloaded:
+            raise
+        except Exception:  # noqa: BLE001
+            logger.exception("Could not read catalog version, bypassing cache")
+            return {}
+        key = decision_key(decision)
+        cached = cache.get(key, version)
+        REGISTRY.inc(CACHE_METRIC, result="miss" if cached is None else "hit")
+        if cached is not None:
+            logger.info("Cache hit for decision: %s", key)
+            return {**cached, "cached": True}
+        return {"cache_key": key, "catalog_version": version}
+
+    async def store_cache(state: AgentState) -> AgentState:
+        key = state.get("cache_key")
+        if cache is not None and key and not state.get("error"):
+            cache.put(key, state.get("catalog_version"), {
+                "response": state.get("response", ""),
+                "tools_used": state.get("tools_used", []),
+            })
+        return {}
+
+    async def execute(state: AgentState, config: RunnableConfig) -> AgentState:
+        client = tools(config)
         decision = state.get("decision", {})
         action = decision.get("action", "unknown")
         tools_used: list[str] = []
@@ -63,15 +395,29 @@ def build_agent(mcp_client: Optional[MCPClient] = None, llm: Optional[MockLLM] =
             logger.info("Executing action: %s", action)
             if action == "list_products":
                 tools_used.append("list_products")
-                products = await mcp_client.call_tool("list_products", {})
-                category = decision.get("category")
-                if category:
-                    products = [p for p in products if p.get("category") == category]
+                arguments = {key: decision[key] for key in LISTING_ARGUMENTS if decision.get(key) is not None}
+                products = await client.call_tool("list_products", arguments)
+                return {"tool_result": products, "tools_used": tools_used}
+
+            if action == "search_products":
+                tools_used.append("search_products")
+                arguments = {"text": decision.get("text", ""), "limit": decision.get("limit", 10)}
+                products = await client.call_tool("search_products", arguments)
+                return {"tool_result": products, "tools_used": tools_used}
+
+            if action == "list_products_by_price":
+                tools_used.append("list_products_by_price")
+                arguments = {
+                    key: decision[key] for key in PRICE_QUERY_ARGUMENTS if decision.get(key) is not None
+                }
+                products = await client.call_tool("list_products_by_price", arguments)
                 return {"tool_result": products, "tools_used": tools_used}
 
             if action == "get_statistics":
                 tools_used.append("get_statistics")
-                stats = await mcp_client.call_tool("get_statistics", {})
+                category = decision.get("category")
+                arguments = {"category": category} if category else {}
+                stats = await client.call_tool("get_statistics", arguments)
                 return {"tool_result": stats, "tools_used": tools_used}
 
             if action == "add_product":
@@ -82,21 +428,49 @@ def build_agent(mcp_client: Optional[MCPClient] = None, llm: Optional[MockLLM] =
                     "category": decision.get("category"),
                     "in_stock": decision.get("in_stock", True),
                 }
-                created = await mcp_client.call_tool("add_product", payload)
+                created = await client.call_tool("add_product", payload)
                 return {"tool_result": created, "tools_used": tools_used}
 
             if action == "get_product":
                 tools_used.append("get_product")
-                product = await mcp_client.call_tool("get_product", {"product_id": decision.get("product_id")})
+                product = await client.call_tool("get_product", {"product_id": decision.get("product_id")})
                 return {"tool_result": product, "tools_used": tools_used}
 
+            if action == "discount" and (decision.get("product_ids") or decision.get("category")):
+                percent = float(decision.get("percent", 0))
+                product_ids = decision.get("product_ids") or []
+                if product_ids:
+                    tools_used.append("get_products")
+                    chunks = [
+                        product_ids[start:start + DISCOUNT_FETCH_CHUNK]
+                        for start in range(0, len(product_ids), DISCOUNT_FETCH_CHUNK)
+                    ]
+                    pages = await asyncio.gather(
+                        *(client.call_tool("get_products", {"product_ids": chunk}) for chunk in chunks)
+                    )
+                    products = [product for page in pages for product in page]
+                else:
+                    tools_used.append("list_products")
+                    products = await client.call_tool("list_products", {"category": decision["category"]})
+                tools_used.append("calculator")
+                found = {product["id"] for product in products}
+                return {
+                    "tool_result": {
+                        "products": products,
+                        "discount_percent": percent,
+                        "discounted_prices": apply_discount([product["price"] for product in products], percent),
+                        "missing": [product_id for product_id in product_ids if product_id not in found],
+                    },
+                    "tools_used": tools_used,
+                }
+
             if action == "discount":
                 tools_used.append("get_product")
-                product = await mcp_client.call_tool("get_product", {"product_id": decision.get("product_id")})
+                product = await client.call_tool("get_product", {"product_id": decision.get("product_id")})
                 price = float(product.get("price", 0))
                 percent = float(decision.get("percent", 0))
                 tools_used.append("calculator")
-                discounted = calculator(f"{price} * (1 - {percent} / 100)")
+                discounted = calculator(DISCOUNT_EXPRESSION, {"price": price, "percent": percent})
                 return {
                     "tool_result": {
                         "product": product,
@@ -109,6 +483,8 @@ def build_agent(mcp_client: Optional[MCPClient] = None, llm: Optional[MockLLM] =
             logger.warning("Unknown action: %s", action)
             return {"error": "Не удалось определить действие для запроса.", "tools_used": tools_used}
 
+        except Overloaded:
+            raise
         except Exception as exc:  # noqa: BLE001
             logger.exception("Agent execution error")
             return {"error": str(exc), "tools_used": tools_used}
@@ -122,14 +498,18 @@ def build_agent(mcp_client: Optional[MCPClient] = None, llm: Optional[MockLLM] =
         action = decision.get("action")
         result = state.get("tool_result")
 
-        if action == "list_products":
+        if action in ("list_products", "search_products", "list_products_by_price"):
             response = format_products(result)
             return {"response": response, "tools_used": state.get("tools_used", [])}
 
         if action == "get_statistics":
             count = result.get("count")
             avg = formatter(result.get("average_price"), "currency")
-            response = f"Всего продуктов: {count}. Средняя цена: {avg}."
+            category = result.get("category")
+            if category:
+                response = f"Продуктов в категории {category}: {count}. Средняя цена: {avg}."
+            else:
+                response = f"Всего продуктов: {count}. Средняя цена: {avg}."
             return {"response": response, "tools_used": state.get("tools_used", [])}
 
         if action == "add_product":
@@ -143,6 +523,18 @@ def build_agent(mcp_client: Optional[MCPClient] = None, llm: Optional[MockLLM] =
             response = format_products([result])
             return {"response": response, "tools_used": state.get("tools_used", [])}
 
+        if action == "discount" and "products" in result:
+            percent = result.get("discount_percent")
+            lines = [
+                f"{product.get('name')} (ID {product.get('id')}): "
+                f"{formatter(product.get('price'), 'currency')} → {formatter(price, 'currency')}"
+                for product, price in zip(result["products"], result["discounted_prices"])
+            ]
+            header = f"Цены после скидки {percent}%:" if lines else EMPTY_PRODUCTS_MESSAGE
+            if result.get("missing"):
+                lines.append(f"Не найдены товары с ID: {', '.join(map(str, result['missing']))}")
+            return {"response": "\n".join([header, *lines]), "tools_used": state.get("tools_used", [])}
+
         if action == "discount":
             product = result.get("product", {})
             discounted = formatter(result.get("discounted_price"), "currency")
@@ -155,13 +547,27 @@ def build_agent(mcp_client: Optional[MCPClient] = None, llm: Optional[MockLLM] =
         return {"response": "Запрос обработан.", "tools_used": state.get("tools_used", [])}
 
     graph = StateGraph(AgentState)
-    graph.add_node("analyze", analyze)
-    graph.add_node("execute", execute)
-    graph.add_node("respond", respond)
+    for name, node in (
+        ("analyze", analyze),
+        ("check_cache", check_cache),
+        ("execute", execute),
+        ("respond", respond),
+        ("store_cache", store_cache),
+    ):
+        graph.add_node(name, _timed_node(name, node))
     graph.set_entry_point("analyze")
-    graph.add_edge("analyze", "execute")
+    graph.add_edge("analyze", "check_cache")
+    graph.add_conditional_edges(
+        "check_cache",
+        lambda state: "hit" if state.get("cached") else "miss",
+        {"hit": END, "miss": "execute"},
+    )
     graph.add_edge("execute", "respond")
-    graph.add_edge("respond", END)
+    graph.add_edge("respond", "store_cache")
+    graph.add_edge("store_cache", END)
+
+    async def decide(query: str) -> Dict[str, Any]:
+        return (await analyze({"query": query}))["decision"]
 
     app = graph.compile()
-    return AgentRunner(app)
+    return AgentRunner(app, mcp_client, cache, decide=decide)
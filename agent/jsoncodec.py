@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import json
+from typing import Any, BinaryIO, Iterator
+
+_WHITESPACE = b" \t\r\n"
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+
+def dumps(value: Any) -> str:
+    """Encode ``value`` as compact JSON text, using orjson when installed."""
+    return dump_bytes(value).decode("utf-8")
+
+
+def dump_bytes(value: Any, indent: bool = False) -> bytes:
+    """Encode ``value`` as UTF-8 JSON, indented by two spaces if ``indent``."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(value, option=option)
+    if indent:
+        # json.dumps (unlike json.dump) encodes in one pass instead of many small writes.
+        return json.dumps(value, ensure_ascii=False, indent=2).encode("utf-8")
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(text: str | bytes) -> Any:
+    """Decode JSON text; raises ``ValueError`` (``JSONDecodeError``) on bad input."""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def iter_objects(stream: BinaryIO, chunk_size: int = 1 << 20) -> Iterator[dict]:
+    """Decode a JSON array of objects from ``stream`` one chunk at a time.
+
+    Each chunk is cut after the last object that ends in it and decoded with
+    ``loads``, so the whole document is never held in memory, only about a
+    chunk of it. A cut that falls inside a string or a nested object leaves
+    unbalanced JSON and is retried at the previous ``}``.
+
+    Raises:
+        ValueError: If the input is not a JSON array of objects.
+    """
+    buffer = stream.read(chunk_size).lstrip(_WHITESPACE)
+    if not buffer.startswith(b"["):
+        raise ValueError("Expected a JSON array")
+    buffer = buffer[1:]
+    after_item = eof = False
+    while True:
+        buffer = buffer.lstrip(_WHITESPACE)
+        if after_item and buffer:
+            if buffer.startswith(b","):
+                buffer = buffer[1:].lstrip(_WHITESPACE)
+            elif not buffer.startswith(b"]"):
+                raise ValueError("Expected ',' or ']' between array items")
+            after_item = False
+        if buffer.startswith(b"]"):
+            if (buffer[1:] + stream.read()).strip(_WHITESPACE):
+                raise ValueError("Unexpected data after the JSON array")
+            return
+        items, end = _decode_objects(buffer, eof) if buffer else ([], 0)
+        if end:
+            yield from items
+            buffer = buffer[end:]
+            after_item = True
+            continue
+        if eof:
+            raise ValueError("Truncated or invalid JSON array")
+        # Read at least as much as is buffered, so a huge item costs O(n) rereads.
+        chunk = stream.read(max(chunk_size, len(buffer)))
+        eof = not chunk
+        buffer += chunk
+
+
+def _decode_objects(buffer: bytes, eof: bool) -> tuple[list, int]:
+    """Decode the longest run of whole objects at the start of ``buffer``.
+
+    Returns the objects and the offset just past the last one, or ``([], 0)``
+    if no object is complete yet.
+    """
+    end = len(buffer)
+    while True:
+        end = buffer.rfind(b"}", 0, end)
+        if end < 0:
+            return [], 0
+        rest = buffer[end + 1:].lstrip(_WHITESPACE)
+        # A closing brace of an item is followed by ',' or ']' (or the end of
+        # the data read so far); anything else means it is inside a string.
+        if rest[:1] in (b",", b"]") or (not rest and not eof):
+            try:
+                items = loads(b"[" + buffer[:end + 1] + b"]")
+            except ValueError:
+                pass
+            else:
+                if not all(isinstance(item, dict) for item in items):
+                    raise ValueError("Expected a JSON array of objects")
+                return items, end + 1
@@ -1,24 +1,419 @@
 from __future__ import annotations
 
+import asyncio
 import json
+import logging
+import os
 import sys
-from typing import Any, Optional
+import time
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Any, AsyncIterator, Coroutine, Optional
 
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
+from . import jsoncodec
+from .admission import AdmissionController, DeadlineExceeded, Overloaded, context_without_deadline, remaining_time
+from .metrics import REGISTRY
+from .startup import STARTUP
+
+if TYPE_CHECKING:
+    from mcp import ClientSession, StdioServerParameters
+
+
+logger = logging.getLogger(__name__)
+
+MCP_PHASE_METRIC = "mcp_client_phase_duration_seconds"
+MCP_CALLS_METRIC = "mcp_tool_calls_total"
+MCP_COALESCED_METRIC = "mcp_tool_calls_coalesced_total"
+
+TRANSPORTS = ("stdio", "inprocess")
+DEFAULT_TRANSPORT = os.getenv("MCP_TRANSPORT", "stdio")
+DEFAULT_POOL_SIZE = int(os.getenv("MCP_POOL_SIZE", "2"))
+DEFAULT_HEALTH_CHECK_INTERVAL = float(os.getenv("MCP_HEALTH_CHECK_INTERVAL", "30"))
+DEFAULT_COALESCE = os.getenv("MCP_COALESCE", "1").lower() in {"1", "true", "yes"}
+# Concurrent calls default to the pool size; beyond that callers queue.
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("MCP_MAX_CONCURRENCY", "0"))
+DEFAULT_MAX_QUEUE = int(os.getenv("MCP_MAX_QUEUE", "64"))
+DEFAULT_CALL_TIMEOUT = float(os.getenv("MCP_CALL_TIMEOUT", "30"))
+_PING_TIMEOUT = 5.0
+_SHUTDOWN_TIMEOUT = 10.0
+# Tools without side effects; identical calls to them may share one result.
+READ_ONLY_TOOLS = frozenset(
+    {
+        "list_products",
+        "list_products_by_price",
+        "get_product",
+        "get_products",
+        "search_products",
+        "get_statistics",
+        "get_catalog_version",
+    }
+)
+
+
+def _parse_tool_timeouts(value: str) -> dict[str, float]:
+    """Parse ``MCP_TOOL_TIMEOUTS``, e.g. ``"add_product=5,list_products=10"``."""
+    timeouts: dict[str, float] = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, _, seconds = item.partition("=")
+        timeouts[name.strip()] = float(seconds)
+    return timeouts
+
+
+DEFAULT_TOOL_TIMEOUTS = _parse_tool_timeouts(os.getenv("MCP_TOOL_TIMEOUTS", ""))
+# The stdio transport only inherits a minimal environment, so storage settings
+# have to be forwarded to the server processes explicitly.
+_FORWARDED_ENV_PREFIXES = ("PRODUCTS_",)
+
+
+def _server_environment() -> dict[str, str]:
+    return {key: value for key, value in os.environ.items() if key.startswith(_FORWARDED_ENV_PREFIXES)}
+
+
+class _PooledSession:
+    """A warm MCP server process with an initialized ``ClientSession``.
+
+    The stdio transport and the session are async context managers that must be
+    entered and exited by the same task, so each pooled session owns a
+    background task that keeps them open until ``stop`` is requested.
+    """
+
+    def __init__(self, params: Optional[StdioServerParameters] = None) -> None:
+        self._params = params
+        self._task: Optional[asyncio.Task] = None
+        self._ready = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._error: Optional[BaseException] = None
+        self.session: Optional[ClientSession] = None
+        self.last_used = 0.0
+
+    @property
+    def alive(self) -> bool:
+        return self.session is not None and self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        self._ready = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._error = None
+        self._task = asyncio.create_task(self._run())
+        await self._ready.wait()
+        if self.session is None:
+            raise RuntimeError(f"Failed to start MCP server: {self._error!r}")
+        self.last_used = time.monotonic()
+
+    @asynccontextmanager
+    async def _connect(self) -> AsyncIterator[ClientSession]:
+        # Imported on first use: the MCP SDK is slow to import and the
+        # in-process transport does not need its stdio client.
+        from mcp import ClientSession
+        from mcp.client.stdio import stdio_client
+
+        started = time.perf_counter()
+        async with stdio_client(self._params) as (read_stream, write_stream):
+            REGISTRY.observe(MCP_PHASE_METRIC, time.perf_counter() - started, phase="spawn")
+            async with ClientSession(read_stream, write_stream) as session:
+                with REGISTRY.time(MCP_PHASE_METRIC, phase="initialize"):
+                    await session.initialize()
+                yield session
+
+    async def _run(self) -> None:
+        try:
+            async with self._connect() as session:
+                self.session = session
+                self._ready.set()
+                await self._closing.wait()
+        except Exception as exc:  # noqa: BLE001
+            self._error = exc
+            logger.warning("MCP session terminated: %r", exc)
+        finally:
+            self.session = None
+            self._ready.set()
+
+    async def ping(self) -> bool:
+        if not self.alive:
+            return False
+        try:
+            await asyncio.wait_for(self.session.send_ping(), timeout=_PING_TIMEOUT)
+        except Exception:  # noqa: BLE001
+            return False
+        return True
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._closing.set()
+        try:
+            await asyncio.wait_for(self._task, timeout=_SHUTDOWN_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning("MCP session did not shut down in time, cancelling")
+        except Exception:  # noqa: BLE001
+            pass
+        self._task = None
+        self.session = None
+
+    async def restart(self) -> None:
+        await self.stop()
+        await self.start()
+
+
+class _InProcessSession(_PooledSession):
+    """A session with the FastMCP server mounted in this process.
+
+    Uses FastMCP's in-memory transport, so there is no subprocess or pipe and
+    all sessions share the server module's single ``ProductStore``.
+    """
+
+    @asynccontextmanager
+    async def _connect(self) -> AsyncIterator[ClientSession]:
+        # Importing the server loads fastmcp and the catalog; do it off the
+        # event loop so other startup work keeps running meanwhile.
+        server = await asyncio.to_thread(STARTUP.import_module, "mcp_server.server")
+        from fastmcp import Client
+
+        with REGISTRY.time(MCP_PHASE_METRIC, phase="initialize"):
+            client = Client(server.mcp)
+            await client.__aenter__()
+        try:
+            yield client.session
+        finally:
+            await client.__aexit__(None, None, None)
+
+    async def ping(self) -> bool:
+        # The in-memory server has no transport that could break.
+        return self.alive
 
 
 class MCPClient:
-    def __init__(self, command: Optional[list[str]] = None) -> None:
+    """Calls MCP tools through a pool of long-lived server sessions.
+
+    The pool is started lazily on the first call (or explicitly via ``start``)
+    and every call leases one warm session. Sessions that crashed or fail a
+    health check are restarted before they are handed out again.
+
+    With the default ``stdio`` transport every session is its own server
+    process; ``inprocess`` mounts the FastMCP server in this process instead.
+
+    Concurrent calls of the same read-only tool with the same arguments are
+    coalesced into one request (single flight) unless ``coalesce`` is off;
+    ``coalesced`` counts the calls that were served by another one's result.
+
+    At most ``max_concurrency`` calls run at once and ``max_queue`` more may
+    wait; further calls fail fast with ``Overloaded``. Each call is bounded by
+    its tool timeout and the request deadline. A call that hits the tool
+    timeout is cancelled and its session restarted, since the server may still
+    be busy; one that outlives the request deadline is cancelled with
+    ``DeadlineExceeded`` and its session kept.
+    """
+
+    def __init__(
+        self,
+        command: Optional[list[str]] = None,
+        pool_size: Optional[int] = None,
+        health_check_interval: Optional[float] = None,
+        env: Optional[dict[str, str]] = None,
+        transport: Optional[str] = None,
+        coalesce: Optional[bool] = None,
+        max_concurrency: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        call_timeout: Optional[float] = None,
+        tool_timeouts: Optional[dict[str, float]] = None,
+    ) -> None:
+        self._transport = (transport or DEFAULT_TRANSPORT).lower()
+        if self._transport not in TRANSPORTS:
+            raise ValueError(f"Unknown MCP transport: {self._transport}")
         self._command = command or [sys.executable, "-m", "mcp_server.server"]
+        self._pool_size = max(1, pool_size or DEFAULT_POOL_SIZE)
+        self._health_check_interval = (
+            DEFAULT_HEALTH_CHECK_INTERVAL if health_check_interval is None else health_check_interval
+        )
+        self._env = _server_environment() if env is None else env
+        self._sessions: list[_PooledSession] = []
+        self._idle: Optional[asyncio.Queue[_PooledSession]] = None
+        self._start_lock: Optional[asyncio.Lock] = None
+        self._coalesce = DEFAULT_COALESCE if coalesce is None else coalesce
+        self._inflight: dict[str, asyncio.Future] = {}
+        self.coalesced = 0
+        self.admission = AdmissionController(
+            "mcp",
+            max_concurrency or DEFAULT_MAX_CONCURRENCY or self._pool_size,
+            DEFAULT_MAX_QUEUE if max_queue is None else max_queue,
+        )
+        self._call_timeout = DEFAULT_CALL_TIMEOUT if call_timeout is None else call_timeout
+        self._tool_timeouts = DEFAULT_TOOL_TIMEOUTS if tool_timeouts is None else tool_timeouts
+
+    @property
+    def pool_size(self) -> int:
+        return self._pool_size
+
+    @property
+    def in_process(self) -> bool:
+        return self._transport == "inprocess"
+
+    def _new_session(self) -> _PooledSession:
+        if self.in_process:
+            return _InProcessSession()
+        from mcp import StdioServerParameters
+
+        params = StdioServerParameters(command=self._command[0], args=self._command[1:], env=self._env)
+        return _PooledSession(params)
+
+    async def start(self) -> None:
+        """Spawn and initialize all pooled sessions (idempotent)."""
+        if self._idle is not None:
+            return
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self._idle is not None:
+                return
+            sessions = [self._new_session() for _ in range(self._pool_size)]
+            try:
+                await asyncio.gather(*(session.start() for session in sessions))
+            except Exception:
+                await asyncio.gather(*(session.stop() for session in sessions))
+                raise
+            idle: asyncio.Queue[_PooledSession] = asyncio.Queue()
+            for session in sessions:
+                idle.put_nowait(session)
+            self._sessions = sessions
+            self._idle = idle
+            logger.info("MCP session pool started with %s sessions", self._pool_size)
+
+    async def aclose(self) -> None:
+        """Shut down every pooled server process."""
+        sessions, self._sessions = self._sessions, []
+        self._idle = None
+        await asyncio.gather(*(session.stop() for session in sessions))
+        if sessions:
+            logger.info("MCP session pool stopped")
+
+    async def _ensure_healthy(self, pooled: _PooledSession) -> None:
+        if not pooled.alive:
+            logger.warning("MCP session is down, restarting")
+            await pooled.restart()
+            return
+        idle_for = time.monotonic() - pooled.last_used
+        if idle_for >= self._health_check_interval and not await pooled.ping():
+            logger.warning("MCP session failed health check, restarting")
+            await pooled.restart()
+
+    @asynccontextmanager
+    async def _lease(self) -> AsyncIterator[ClientSession]:
+        await self.start()
+        idle = self._idle
+        pooled = await idle.get()
+        try:
+            await self._ensure_healthy(pooled)
+            try:
+                yield pooled.session
+            except Overloaded:
+                # The request ran out of time, not the server: keep the session.
+                raise
+            except TimeoutError:
+                logger.warning("MCP call timed out, restarting session")
+                await pooled.restart()
+                raise
+            except Exception:
+                if not await pooled.ping():
+                    logger.warning("MCP session broken during call, restarting")
+                    await pooled.restart()
+                raise
+        finally:
+            pooled.last_used = time.monotonic()
+            idle.put_nowait(pooled)
 
     async def call_tool(self, name: str, arguments: dict[str, Any]) -> Any:
-        params = StdioServerParameters(command=self._command[0], args=self._command[1:])
-        async with stdio_client(params) as (read_stream, write_stream):
-            async with ClientSession(read_stream, write_stream) as session:
-                await session.initialize()
-                result = await session.call_tool(name, arguments)
-        return self._normalize_result(result)
+        if not self._coalesce or name not in READ_ONLY_TOOLS:
+            return await self._call_tool(name, arguments)
+        key = tool_call_key(name, arguments)
+        call = self._inflight.get(key)
+        if call is None:
+            call = _shared_call(name, self._call_tool(name, arguments))
+            self._inflight[key] = call
+            call.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.coalesced += 1
+            REGISTRY.inc(MCP_COALESCED_METRIC, tool=name)
+        return await _await_shared(name, call)
+
+    def _forget(self, key: str, call: asyncio.Future) -> None:
+        if self._inflight.get(key) is call:
+            del self._inflight[key]
+        if not call.cancelled():
+            call.exception()  # retrieved here in case every caller was cancelled
+
+    @asynccontextmanager
+    async def pinned(self) -> AsyncIterator["PinnedToolCalls"]:
+        """Lease one session, and one admission slot, for a series of calls.
+
+        Every call made through the yielded object reaches the same server
+        process, e.g. the chunks of one bulk import, so the other processes
+        reload the catalog once afterwards instead of after every chunk.
+        """
+        async with self.admission.admit(), self._lease() as session:
+            yield PinnedToolCalls(self, session)
+
+    @asynccontextmanager
+    async def _session_for_call(self, pinned: Optional[ClientSession]) -> AsyncIterator[ClientSession]:
+        if pinned is not None:
+            yield pinned
+            return
+        async with self.admission.admit(), self._lease() as session:
+            yield session
+
+    async def _call_tool(self, name: str, arguments: dict[str, Any], pinned: Optional[ClientSession] = None) -> Any:
+        status = "error"
+        try:
+            leased_at = time.perf_counter()
+            async with self._session_for_call(pinned) as session:
+                REGISTRY.observe(MCP_PHASE_METRIC, time.perf_counter() - leased_at, phase="lease", tool=name)
+                timeout = self._tool_timeouts.get(name, self._call_timeout) or None
+                remaining = remaining_time()
+                if remaining is not None and remaining <= 0:
+                    status = "deadline"
+                    raise DeadlineExceeded(f"mcp: request deadline passed before calling {name}")
+                # Only the tool timeout says the server is stuck (and gets its
+                # session restarted); a short request deadline is the caller's.
+                deadline_first = remaining is not None and (timeout is None or remaining < timeout)
+                with REGISTRY.time(MCP_PHASE_METRIC, phase="call", tool=name):
+                    try:
+                        result = await asyncio.wait_for(
+                            session.call_tool(name, arguments), remaining if deadline_first else timeout
+                        )
+                    except TimeoutError:
+                        if deadline_first:
+                            status = "deadline"
+                            raise DeadlineExceeded(f"mcp: request deadline passed while calling {name}") from None
+                        status = "timeout"
+                        raise TimeoutError(f"Tool {name} timed out after {timeout:.3g}s") from None
+            with REGISTRY.time(MCP_PHASE_METRIC, phase="decode", tool=name):
+                normalized = self._normalize_result(result)
+            # A tool that raised still answers; its message is the result. The
+            # flag is ``isError`` on the wire and in older SDKs, ``is_error`` in newer.
+            failed = getattr(result, "is_error", None)
+            if failed is None:
+                failed = getattr(result, "isError", False)
+            status = "tool_error" if failed else "ok"
+            return normalized
+        finally:
+            REGISTRY.inc(MCP_CALLS_METRIC, tool=name, status=status)
+
+    async def call_tool_on_all(self, name: str, arguments: dict[str, Any]) -> list[Any]:
+        """Call a tool once on every pooled server process.
+
+        Meant for cheap administrative tools such as ``get_metrics``. The
+        sessions are called one at a time, each under admission control, and
+        are not taken out of the idle pool: an MCP session serves concurrent
+        requests, so regular tool calls keep running meanwhile.
+        """
+        await self.start()
+        timeout = self._tool_timeouts.get(name, self._call_timeout) or None
+        results = []
+        for pooled in list(self._sessions):
+            async with self.admission.admit():
+                if not pooled.alive:
+                    continue
+                result = await asyncio.wait_for(pooled.session.call_tool(name, arguments), timeout)
+            results.append(self._normalize_result(result))
+        return results
 
     @staticmethod
     def _normalize_result(result: Any) -> Any:
@@ -31,8 +426,82 @@ class MCPClient:
                 text = getattr(first, "text", None)
                 if isinstance(text, str):
                     try:
-                        return json.loads(text)
-                    except json.JSONDecodeError:
+                        return jsoncodec.loads(text)
+                    except ValueError:
                         return text
             return content
         return result
+
+
+def _shared_call(name: str, coro: Coroutine[Any, Any, Any]) -> asyncio.Task:
+    """Start a tool call that several callers may wait for.
+
+    It runs without the request deadline of whichever caller happened to
+    start it, so that caller running out of time does not fail it for the
+    others; each caller waits under its own deadline with ``_await_shared``.
+    The starting caller's timing breakdown still records its phases.
+
+    Raises:
+        DeadlineExceeded: If the caller's deadline has already passed.
+    """
+    remaining = remaining_time()
+    if remaining is not None and remaining <= 0:
+        coro.close()
+        raise DeadlineExceeded(f"mcp: request deadline passed before calling {name}")
+    return asyncio.get_running_loop().create_task(coro, context=context_without_deadline())
+
+
+async def _await_shared(name: str, call: asyncio.Future) -> Any:
+    """Wait for a shared call until the current request's deadline.
+
+    Shielded, so a caller that is cancelled or runs out of time does not
+    cancel the call for the others.
+    """
+    try:
+        return await asyncio.wait_for(asyncio.shield(call), remaining_time())
+    except TimeoutError:
+        if call.done():
+            raise  # the tool's own timeout, raised by the call itself
+        raise DeadlineExceeded(f"mcp: request deadline passed while waiting for {name}") from None
+
+
+def tool_call_key(name: str, arguments: dict[str, Any]) -> str:
+    return json.dumps([name, arguments], sort_keys=True, ensure_ascii=False, default=str)
+
+
+class PinnedToolCalls:
+    """Tool calls bound to one leased session; see ``MCPClient.pinned``."""
+
+    def __init__(self, client: MCPClient, session: ClientSession) -> None:
+        self._client = client
+        self._session = session
+
+    async def call_tool(self, name: str, arguments: dict[str, Any]) -> Any:
+        return await self._client._call_tool(name, arguments, pinned=self._session)
+
+
+class BatchToolCalls:
+    """Collapses identical read-only tool calls made while serving one batch.
+
+    Wraps a client with the same ``call_tool`` interface. The first call with a
+    given name and arguments goes to the server, later ones await its result.
+    Any other (writing) tool call clears what was remembered so far.
+    """
+
+    def __init__(self, client: Any) -> None:
+        self._client = client
+        self._calls: dict[str, asyncio.Future] = {}
+        self.deduplicated = 0
+
+    async def call_tool(self, name: str, arguments: dict[str, Any]) -> Any:
+        if name not in READ_ONLY_TOOLS:
+            self._calls.clear()
+            return await self._client.call_tool(name, arguments)
+        key = tool_call_key(name, arguments)
+        call = self._calls.get(key)
+        if call is None:
+            call = _shared_call(name, self._client.call_tool(name, arguments))
+            self._calls[key] = call
+        else:
+            self.deduplicated += 1
+        return await _await_shared(name, call)
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import bisect
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterable, Iterator, Optional
+
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Per-request timing breakdown, enabled by ``collect_timings``. Asyncio tasks
+# copy the context when they are created, so nodes and tool calls spawned while
+# serving a request append to the same list.
+_request_timings: ContextVar[Optional[list[dict]]] = ContextVar("request_timings", default=None)
+
+Labels = tuple[tuple[str, str], ...]
+
+
+def _labels(labels: dict[str, Any]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Iterable[tuple[str, str]]) -> str:
+    rendered = ",".join(f'{key}="{_escape(value)}"' for key, value in labels)
+    return f"{{{rendered}}}" if rendered else ""
+
+
+class _Histogram:
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Process-local latency histograms and counters in Prometheus format."""
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self._buckets = buckets
+        self._histograms: dict[tuple[str, Labels], _Histogram] = {}
+        self._counters: dict[tuple[str, Labels], float] = {}
+
+    def observe(self, name: str, seconds: float, **labels: Any) -> None:
+        key = (name, _labels(labels))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = _Histogram(self._buckets)
+        histogram.observe(seconds)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append({"metric": name, **dict(key[1]), "seconds": round(seconds, 6)})
+
+    def inc(self, name: str, value: float = 1.0, **labels: Any) -> None:
+        key = (name, _labels(labels))
+        self._counters[key] = self._counters.get(key, 0.0) + value
+
+    @contextmanager
+    def time(self, name: str, **labels: Any) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def snapshot(self) -> dict:
+        """JSON-serializable state, used to ship metrics between processes."""
+        return {
+            "histograms": [
+                {"name": name, "labels": dict(labels), "counts": h.counts, "sum": h.sum, "count": h.count}
+                for (name, labels), h in self._histograms.items()
+            ],
+            "counters": [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in self._counters.items()
+            ],
+        }
+
+    def merge(self, snapshot: dict) -> None:
+        for item in snapshot.get("histograms", []):
+            key = (item["name"], _labels(item["labels"]))
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(self._buckets)
+            for index, count in enumerate(item["counts"][: len(histogram.counts)]):
+                histogram.counts[index] += count
+            histogram.sum += item["sum"]
+            histogram.count += item["count"]
+        for item in snapshot.get("counters", []):
+            key = (item["name"], _labels(item["labels"]))
+            self._counters[key] = self._counters.get(key, 0.0) + item["value"]
+
+    def render(self, extra_snapshots: Iterable[dict] = ()) -> str:
+        """Render in the Prometheus text exposition format."""
+        registry = self
+        extra_snapshots = list(extra_snapshots)
+        if extra_snapshots:
+            registry = MetricsRegistry(self._buckets)
+            for snapshot in [self.snapshot(), *extra_snapshots]:
+                registry.merge(snapshot)
+
+        lines: list[str] = []
+        typed: set[str] = set()
+        for (name, labels), histogram in sorted(registry._histograms.items()):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} histogram")
+            cumulative = 0
+            for bound, count in zip((*histogram.buckets, "+Inf"), histogram.counts):
+                cumulative += count
+                le = bound if isinstance(bound, str) else repr(bound)
+                lines.append(f"{name}_bucket{_format_labels((*labels, ('le', le)))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        for (name, labels), value in sorted(registry._counters.items()):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{_format_labels(labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+@contextmanager
+def collect_timings() -> Iterator[list[dict]]:
+    """Collect every observation made in this context into a list."""
+    timings: list[dict] = []
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import json
-from typing import Any, List, Optional
+from typing import Any, Dict, List, Optional
 
 from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_core.messages import AIMessage, BaseMessage
@@ -17,6 +17,10 @@ class MockLLM(BaseChatModel):
     def _llm_type(self) -> str:  # noqa: D401
         return "mock-llm"
 
+    def decide(self, text: str) -> Dict[str, Any]:
+        """Return the decision as a dict, without the chat message JSON round trip."""
+        return parse_query(text)
+
     def _generate(
         self,
         messages: List[BaseMessage],
@@ -1,20 +1,146 @@
 from __future__ import annotations
 
+import os
 import re
-from typing import Any, Dict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
 
 
-def parse_query(query: str) -> Dict[str, Any]:
-    original = query.strip()
+PARSE_CACHE_SIZE = int(os.getenv("AGENT_PARSE_CACHE_SIZE", "1024"))
+
+# Intents in priority order: when a query matches several, the first wins.
+_INTENT_TOKENS = (
+    ("get_statistics", ("средн", "average", "статист")),
+    ("add_product", ("добав", "add")),
+    ("discount", ("скидк", "discount")),
+    ("search_products", ("найд", "найти", "поиск", "search", "find")),
+    (
+        "list_products_by_price",
+        (
+            "дешев", "дорож", "дорог", "cheap", "expensive", r"цен\w*\s+от",
+            r"\bот\s*\d+(?:[\.,]\d+)?\s*до\s*\d", r"\b(?:under|over|below|above)\s*\d",
+        ),
+    ),
+    ("list_products", ("покаж", "list", "продукт")),
+)
+_INTENT_PRIORITY = {intent: rank for rank, (intent, _) in enumerate(_INTENT_TOKENS)}
+# One alternation finds every intent keyword in a single scan of the query.
+_INTENT_RE = re.compile(
+    "|".join(f"(?P<{intent}>{'|'.join(tokens)})" for intent, tokens in _INTENT_TOKENS),
+    re.IGNORECASE,
+)
+
+# A category name runs to the next comma or to a price or stock condition.
+_CATEGORY_STOP = (
+    r"(?:не\s+)?(?:дешевле|дороже)|от|до|cheaper|more\s+expensive|under|over|below|above"
+    r"|(?:\d+\s+)?(?:сам(?:ый|ая|ое|ую|ые|ых)|most|cheapest)|(?:нет\s+)?в\s+наличии|(?:out\s+of|in)\s+stock"
+)
+_CATEGORY_RE = re.compile(rf"категори[яи]\s*([^,]+?)(?=\s+(?:{_CATEGORY_STOP})\b|\s*,|\s*$)", re.IGNORECASE)
+# A new product's category is taken verbatim up to the next comma ("Защита от воды").
+_NEW_CATEGORY_RE = re.compile(r"категори[яи]\s*([^,]+)", re.IGNORECASE)
+_NAME_RE = re.compile(r"продукт\s*[:\-]?\s*([^,]+)", re.IGNORECASE)
+_PRICE_RE = re.compile(r"цен[ауы]?\s*([0-9]+(?:[\.,][0-9]+)?)", re.IGNORECASE)
+_PERCENT_RE = re.compile(r"([0-9]+(?:[\.,][0-9]+)?)\s*%")
+_ID_RE = re.compile(r"id\s*(\d+)")
+_ID_LIST_RE = re.compile(r"id\s*(\d+(?:\s*(?:,|и|and)\s*(?:id\s*)?\d+)*)")
+_NUMBER_RE = re.compile(r"\d+")
+_SEARCH_TEXT_RE = re.compile(
+    r"(?:найд\w*|найти|поиск|search|find)\b\s*[:\-]?\s*(?:(?:товар|продукт)\w*\s+)?(.+)", re.IGNORECASE
+)
+_AMOUNT = r"([0-9]+(?:[\.,][0-9]+)?)"
+_MAX_PRICE_RE = re.compile(
+    rf"(?:(?<!не )дешевле|не\s+дороже|\bдо|cheaper\s+than|under|below)\s*{_AMOUNT}", re.IGNORECASE
+)
+_MIN_PRICE_RE = re.compile(
+    rf"(?:(?<!не )дороже|не\s+дешевле|\bот|more\s+expensive\s+than|over|above)\s*{_AMOUNT}", re.IGNORECASE
+)
+# "5 самых дорогих", "самый дешевый", "3 cheapest", "most expensive".
+_TOP_RE = re.compile(
+    r"(?:(\d+)\s+)?(?:\b(сам(?:ый|ая|ое|ую|ые|ых))\s+(дорог|дешев)|most\s+(expensive)|(cheap)est)", re.IGNORECASE
+)
+_IN_STOCK_RE = re.compile(r"(нет\s+в\s+наличии|out\s+of\s+stock)|в\s+наличии|in\s+stock", re.IGNORECASE)
+_SINGULAR_TOP = ("самый", "самая", "самое", "самую")
+
+SEARCH_LIMIT = 10
+TOP_LIMIT = 5
+
+
+def _extract_category(text: str) -> Optional[str]:
+    category_match = _CATEGORY_RE.search(text)
+    if not category_match:
+        return None
+    return category_match.group(1).strip().rstrip("?!.").strip() or None
+
+
+def _extract_in_stock(text: str) -> Optional[bool]:
+    """True for "в наличии", False for "нет в наличии", None when stock is not mentioned."""
+    stock_match = _IN_STOCK_RE.search(text)
+    return None if stock_match is None else stock_match.group(1) is None
+
+
+def _listing(original: str) -> Dict[str, Any]:
+    decision: Dict[str, Any] = {"action": "list_products", "category": _extract_category(original)}
+    in_stock = _extract_in_stock(original)
+    if in_stock is not None:
+        decision["in_stock"] = in_stock
+    return decision
+
+
+def _extract_ids(text: str) -> List[int]:
+    """IDs listed after "id", e.g. "id 1, 2 и 5" -> [1, 2, 5] (duplicates dropped)."""
+    ids_match = _ID_LIST_RE.search(text)
+    if not ids_match:
+        return []
+    return list(dict.fromkeys(int(value) for value in _NUMBER_RE.findall(ids_match.group(1))))
+
+
+def _amount(match: Optional[re.Match]) -> Optional[float]:
+    return float(match.group(1).replace(",", ".")) if match else None
+
+
+def _price_query(original: str) -> Dict[str, Any]:
+    """Price range and/or top-k decision, e.g. "товары дешевле 20000" or "5 самых дорогих"."""
+    min_price = _amount(_MIN_PRICE_RE.search(original))
+    max_price = _amount(_MAX_PRICE_RE.search(original))
+    top_match = _TOP_RE.search(original)
+    if top_match is None and min_price is None and max_price is None:
+        return _listing(original)
+
+    order, limit = "asc", None
+    if top_match is not None:
+        count, superlative, stem, expensive = top_match.group(1, 2, 3, 4)
+        order = "desc" if expensive or (stem or "").lower() == "дорог" else "asc"
+        if count:
+            limit = int(count)
+        else:
+            limit = 1 if superlative and superlative.lower() in _SINGULAR_TOP else TOP_LIMIT
+    return {
+        "action": "list_products_by_price",
+        "min_price": min_price,
+        "max_price": max_price,
+        "category": _extract_category(original),
+        "in_stock": _extract_in_stock(original),
+        "order": order,
+        "limit": limit,
+    }
+
+
+def _classify(lowered: str) -> Optional[str]:
+    intents = {match.lastgroup for match in _INTENT_RE.finditer(lowered)}
+    return min(intents, key=_INTENT_PRIORITY.__getitem__, default=None)
+
+
+def _parse(original: str) -> Dict[str, Any]:
     lowered = original.lower()
+    intent = _classify(lowered)
 
-    if any(token in lowered for token in ["средн", "average", "статист"]):
-        return {"action": "get_statistics"}
+    if intent == "get_statistics":
+        return {"action": "get_statistics", "category": _extract_category(original)}
 
-    if any(token in lowered for token in ["добав", "add"]):
-        name_match = re.search(r"продукт\s*[:\-]?\s*([^,]+)", original, re.IGNORECASE)
-        price_match = re.search(r"цен[ауы]?\s*([0-9]+(?:[\.,][0-9]+)?)", original, re.IGNORECASE)
-        category_match = re.search(r"категори[яи]\s*([^,]+)", original, re.IGNORECASE)
+    if intent == "add_product":
+        name_match = _NAME_RE.search(original)
+        price_match = _PRICE_RE.search(original)
+        category_match = _NEW_CATEGORY_RE.search(original)
 
         name = name_match.group(1).strip() if name_match else "Новый продукт"
         price = float(price_match.group(1).replace(",", ".")) if price_match else 0.0
@@ -28,24 +154,60 @@ def parse_query(query: str) -> Dict[str, Any]:
             "in_stock": True,
         }
 
-    if any(token in lowered for token in ["скидк", "discount"]):
-        percent_match = re.search(r"([0-9]+(?:[\.,][0-9]+)?)\s*%", lowered)
-        id_match = re.search(r"id\s*(\d+)", lowered)
+    if intent == "discount":
+        percent_match = _PERCENT_RE.search(lowered)
         percent = float(percent_match.group(1).replace(",", ".")) if percent_match else 0.0
-        product_id = int(id_match.group(1)) if id_match else None
+        product_ids = _extract_ids(lowered)
+        if len(product_ids) > 1:
+            return {"action": "discount", "percent": percent, "product_ids": product_ids}
+        category = _extract_category(original)
+        if not product_ids and category:
+            return {"action": "discount", "percent": percent, "category": category}
         return {
             "action": "discount",
             "percent": percent,
-            "product_id": product_id,
+            "product_id": product_ids[0] if product_ids else None,
         }
 
-    if any(token in lowered for token in ["покаж", "list", "продукт"]):
-        category_match = re.search(r"категори[яи]\s*([^,]+)", original, re.IGNORECASE)
-        category = category_match.group(1).strip() if category_match else None
-        return {"action": "list_products", "category": category}
+    if intent == "search_products":
+        # An explicit ID or price constraint says more than the generic verb.
+        id_match = _ID_RE.search(lowered)
+        if id_match:
+            return {"action": "get_product", "product_id": int(id_match.group(1))}
+        price_query = _price_query(original)
+        if price_query["action"] == "list_products_by_price":
+            return price_query
+        text_match = _SEARCH_TEXT_RE.search(original)
+        text = text_match.group(1).strip().rstrip("?!.").strip() if text_match else ""
+        if text:
+            return {"action": "search_products", "text": text, "limit": SEARCH_LIMIT}
+        return {"action": "list_products", "category": None}
+
+    if intent == "list_products_by_price":
+        return _price_query(original)
 
-    id_match = re.search(r"id\s*(\d+)", lowered)
+    if intent == "list_products":
+        return _listing(original)
+
+    id_match = _ID_RE.search(lowered)
     if id_match:
         return {"action": "get_product", "product_id": int(id_match.group(1))}
 
     return {"action": "unknown"}
+
+
+_parse_cached = lru_cache(maxsize=PARSE_CACHE_SIZE)(_parse)
+
+
+def normalize_query(query: str) -> str:
+    """Strip and collapse whitespace; case is kept because names and categories use it."""
+    return " ".join(query.split())
+
+
+def parse_query(query: str) -> Dict[str, Any]:
+    """Turn a query into an action decision.
+
+    Decisions are cached by normalized query text; each call gets its own copy.
+    """
+    decision = _parse_cached(normalize_query(query))
+    return {key: list(value) if isinstance(value, list) else value for key, value in decision.items()}
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import importlib
+import threading
+import time
+from contextlib import contextmanager
+from types import ModuleType
+from typing import Iterator
+
+from .metrics import REGISTRY
+
+
+STARTUP_METRIC = "startup_phase_duration_seconds"
+
+
+class StartupTimeline:
+    """Durations of the import and initialization steps of a process.
+
+    A phase that runs more than once adds up. Every run is also observed under
+    ``STARTUP_METRIC``, so MCP server processes report theirs through
+    ``get_metrics``.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._phases: dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._phases[name] = self._phases.get(name, 0.0) + elapsed
+            REGISTRY.observe(STARTUP_METRIC, elapsed, phase=name)
+
+    def import_module(self, name: str) -> ModuleType:
+        """Import a module, recording how long it took (near zero if it was already loaded)."""
+        with self.phase(f"import {name}"):
+            return importlib.import_module(name)
+
+    def phases(self) -> dict[str, float]:
+        """Phase durations in seconds, in the order they first finished."""
+        with self._lock:
+            return {name: round(elapsed, 4) for name, elapsed in self._phases.items()}
+
+
+STARTUP = StartupTimeline()
@@ -1,7 +1,9 @@
 from __future__ import annotations
 
 import ast
-from typing import Any
+from functools import lru_cache
+from types import CodeType, ModuleType
+from typing import Any, Iterable, Iterator, Mapping, Optional, Sequence, Union
 
 
 _ALLOWED_NODES = (
@@ -10,6 +12,8 @@ _ALLOWED_NODES = (
     ast.UnaryOp,
     ast.Num,
     ast.Constant,
+    ast.Name,
+    ast.Load,
     ast.Add,
     ast.Sub,
     ast.Mult,
@@ -21,6 +25,21 @@ _ALLOWED_NODES = (
     ast.UAdd,
 )
 
+DISCOUNT_EXPRESSION = "price * (1 - percent / 100)"
+
+# Below this many rows the NumPy conversion costs more than it saves.
+_VECTORIZE_THRESHOLD = 64
+
+
+@lru_cache(maxsize=None)
+def _numpy() -> Optional[ModuleType]:
+    """NumPy, imported on the first large batch; it is optional and slow to import."""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
 
 def _validate_expression(node: ast.AST) -> None:
     for child in ast.walk(node):
@@ -28,11 +47,70 @@ def _validate_expression(node: ast.AST) -> None:
             raise ValueError("Unsupported expression")
 
 
-def calculator(expression: str) -> float:
-    """Safely evaluate a basic arithmetic expression."""
+@lru_cache(maxsize=256)
+def _compile_expression(expression: str) -> tuple[CodeType, frozenset[str]]:
+    """Parse, validate and compile an expression once; returns its code and variable names."""
     parsed = ast.parse(expression, mode="eval")
     _validate_expression(parsed)
-    return float(eval(compile(parsed, "<calculator>", "eval"), {"__builtins__": {}}, {}))
+    names = frozenset(node.id for node in ast.walk(parsed) if isinstance(node, ast.Name))
+    return compile(parsed, "<calculator>", "eval"), names
+
+
+def _check_variables(names: frozenset[str], variables: Mapping[str, Any]) -> None:
+    missing = names - variables.keys()
+    if missing:
+        raise ValueError(f"Unknown variable: {', '.join(sorted(missing))}")
+
+
+def calculator(expression: str, variables: Optional[Mapping[str, float]] = None) -> float:
+    """Safely evaluate a basic arithmetic expression.
+
+    The expression may use named variables, e.g. ``calculator(DISCOUNT_EXPRESSION,
+    {"price": 100, "percent": 15})``; compiled expressions are cached, so a fixed
+    template with changing values is only parsed once.
+    """
+    code, names = _compile_expression(expression)
+    variables = variables or {}
+    _check_variables(names, variables)
+    return float(eval(code, {"__builtins__": {}}, {name: variables[name] for name in names}))
+
+
+def calculator_batch(expression: str, variables: Mapping[str, Union[float, Sequence[float]]]) -> list[float]:
+    """Evaluate one expression over columns of inputs, one result per row.
+
+    Each variable is a sequence (all of the same length) or a scalar shared by
+    every row. Large batches are evaluated as NumPy array operations.
+    """
+    code, names = _compile_expression(expression)
+    _check_variables(names, variables)
+    columns = {name: variables[name] for name in names}
+    lengths = {len(value) for value in columns.values() if not isinstance(value, (int, float))}
+    if len(lengths) > 1:
+        raise ValueError("Variables must have the same length")
+    size = lengths.pop() if lengths else 1
+
+    np = _numpy() if size >= _VECTORIZE_THRESHOLD else None
+    if np is not None:
+        arrays = {name: np.asarray(value, dtype=np.float64) for name, value in columns.items()}
+        with np.errstate(divide="raise", invalid="raise"):
+            try:
+                result = eval(code, {"__builtins__": {}}, arrays)
+            except FloatingPointError as exc:
+                raise ZeroDivisionError(str(exc)) from exc
+        return np.broadcast_to(np.asarray(result, dtype=np.float64), (size,)).tolist()
+
+    rows = [
+        {name: value if isinstance(value, (int, float)) else value[row] for name, value in columns.items()}
+        for row in range(size)
+    ]
+    return [float(eval(code, {"__builtins__": {}}, row)) for row in rows]
+
+
+def apply_discount(prices: Sequence[float], percent: float) -> list[float]:
+    """Prices after a ``percent`` discount, computed in one batch evaluation."""
+    if not prices:
+        return []
+    return calculator_batch(DISCOUNT_EXPRESSION, {"price": prices, "percent": float(percent)})
 
 
 def formatter(text: str, style: str = "plain") -> str:
@@ -54,16 +132,28 @@ def formatter(text: str, style: str = "plain") -> str:
     return value
 
 
-def format_products(products: list[dict[str, Any]]) -> str:
-    """Human-readable product list."""
-    if not products:
-        return "Нет продуктов по заданным условиям."
+EMPTY_PRODUCTS_MESSAGE = "Нет продуктов по заданным условиям."
+
 
-    lines = []
+def format_product(item: dict[str, Any]) -> str:
+    """Human-readable line for a single product."""
+    status = "в наличии" if item.get("in_stock") else "нет в наличии"
+    return (
+        f"ID {item.get('id')}: {item.get('name')} | {item.get('category')} | "
+        f"{item.get('price')} | {status}"
+    )
+
+
+def iter_format_products(products: Iterable[dict[str, Any]]) -> Iterator[str]:
+    """Lazily yield product lines, or the empty-result message if there are none."""
+    empty = True
     for item in products:
-        status = "в наличии" if item.get("in_stock") else "нет в наличии"
-        lines.append(
-            f"ID {item.get('id')}: {item.get('name')} | {item.get('category')} | "
-            f"{item.get('price')} | {status}"
-        )
-    return "\n".join(lines)
+        empty = False
+        yield format_product(item)
+    if empty:
+        yield EMPTY_PRODUCTS_MESSAGE
+
+
+def format_products(products: list[dict[str, Any]]) -> str:
+    """Human-readable product list."""
+    return "\n".join(iter_format_products(products))
@@ -1,12 +1,26 @@
 from __future__ import annotations
 
+import asyncio
+import json
 import logging
 import os
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, AsyncIterator, Optional
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 
-from agent.graph import build_agent, AgentRunner
+from agent import jsoncodec
+from agent.admission import Overloaded, request_deadline
+from agent.metrics import REGISTRY, collect_timings
+from agent.startup import STARTUP
+
+if TYPE_CHECKING:
+    # Imported on first use: LangGraph and the MCP SDK take seconds to import,
+    # which the lifespan overlaps with starting the MCP servers.
+    from agent.graph import AgentRunner
+    from agent.mcp_client import MCPClient
 
 
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
@@ -17,30 +31,278 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="AI Engineer Test Task")
-
 _agent: AgentRunner | None = None
+_ready = False
+
+
+MAX_BATCH_SIZE = int(os.getenv("AGENT_BATCH_MAX_SIZE", "100"))
+STREAM_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+REQUEST_TIMEOUT = float(os.getenv("AGENT_REQUEST_TIMEOUT", "30"))
+PREWARM = os.getenv("AGENT_PREWARM", "1").lower() in {"1", "true", "yes"}
 
 
 class QueryRequest(BaseModel):
     query: str
 
 
+class BatchQueryRequest(BaseModel):
+    queries: list[str]
+
+
+def _build_agent(mcp_client: Optional[MCPClient] = None) -> AgentRunner:
+    with STARTUP.phase("build agent"):
+        return STARTUP.import_module("agent.graph").build_agent(mcp_client)
+
+
 def get_agent() -> AgentRunner:
     global _agent
     if _agent is None:
-        _agent = build_agent()
+        _agent = _build_agent()
     return _agent
 
 
+async def _start_mcp_sessions(mcp_client: MCPClient) -> None:
+    with STARTUP.phase("start MCP sessions"):
+        await mcp_client.start()
+
+
+async def start_agent() -> AgentRunner:
+    """Build the agent and start its MCP sessions, overlapping the two.
+
+    The server processes import fastmcp and load the catalog while the graph
+    is imported and compiled in a worker thread.
+    """
+    global _agent
+    if _agent is not None:
+        await _agent.start()
+        return _agent
+    mcp_client = STARTUP.import_module("agent.mcp_client").MCPClient()
+    sessions = asyncio.create_task(_start_mcp_sessions(mcp_client))
+    try:
+        agent = await asyncio.to_thread(_build_agent, mcp_client)
+    except BaseException:
+        await asyncio.gather(sessions, return_exceptions=True)
+        await mcp_client.aclose()
+        raise
+    await sessions
+    _agent = agent
+    return agent
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    """Start the agent and warm every action before reporting ready."""
+    global _ready
+    with STARTUP.phase("startup"):
+        agent = await start_agent()
+        if PREWARM:
+            with STARTUP.phase("prewarm"):
+                await agent.prewarm()
+    _ready = True
+    logger.info("Agent ready, startup phases in seconds: %s", STARTUP.phases())
+    try:
+        yield
+    finally:
+        _ready = False
+        await agent.aclose()
+
+
+app = FastAPI(title="AI Engineer Test Task", lifespan=lifespan)
+
+
+def _etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag in candidates or "*" in candidates
+
+
+def _stream_format(stream: Optional[str], accept: Optional[str]) -> Optional[str]:
+    if stream in STREAM_MEDIA_TYPES:
+        return stream
+    for name, media_type in STREAM_MEDIA_TYPES.items():
+        if accept and media_type in accept:
+            return name
+    return None
+
+
+def _request_timeout(header: Optional[float]) -> Optional[float]:
+    """The deadline for a request: ``X-Request-Timeout`` capped by the server default."""
+    timeout = REQUEST_TIMEOUT or None
+    if header is not None and header > 0:
+        timeout = header if timeout is None else min(header, timeout)
+    return timeout
+
+
+def _overloaded(exc: Overloaded) -> HTTPException:
+    return HTTPException(status_code=exc.status_code, detail=str(exc), headers={"Retry-After": str(exc.retry_after)})
+
+
+async def _prepend(first: dict, events: AsyncIterator[dict]) -> AsyncIterator[dict]:
+    yield first
+    async for event in events:
+        yield event
+
+
+async def _encode_stream(events: AsyncIterator[dict], stream_format: str) -> AsyncIterator[str]:
+    try:
+        async for event in events:
+            payload = json.dumps(event, ensure_ascii=False)
+            if stream_format == "sse":
+                yield f"event: {event['type']}\ndata: {payload}\n\n"
+            else:
+                yield payload + "\n"
+    except Exception as exc:  # noqa: BLE001
+        logger.exception("Unhandled error while streaming")
+        payload = json.dumps({"type": "error", "detail": str(exc)}, ensure_ascii=False)
+        yield f"event: error\ndata: {payload}\n\n" if stream_format == "sse" else payload + "\n"
+
+
 @app.post("/api/v1/agent/query")
-async def query_agent(request: QueryRequest) -> dict:
+async def query_agent(
+    request: QueryRequest,
+    stream: Optional[str] = Query(default=None),
+    timings: bool = Query(default=False),
+    accept: Optional[str] = Header(default=None),
+    if_none_match: Optional[str] = Header(default=None),
+    x_request_timeout: Optional[float] = Header(default=None),
+) -> Response:
     try:
         agent = get_agent()
         logger.info("Query received: %s", request.query)
-        return await agent.run(request.query)
+        stream_format = _stream_format(stream, accept)
+        with request_deadline(_request_timeout(x_request_timeout)):
+            if stream_format:
+                # Pull the first event before answering, so an overloaded
+                # server can still reject the request with a proper status.
+                events = agent.stream(request.query)
+                first = await anext(events)
+                return StreamingResponse(
+                    _encode_stream(_prepend(first, events), stream_format),
+                    media_type=STREAM_MEDIA_TYPES[stream_format],
+                )
+            # Validated before running anything; a timing breakdown is never the same twice.
+            etag = None if timings else await agent.etag(request.query)
+            if etag is not None and _etag_matches(etag, if_none_match):
+                return Response(status_code=304, headers={"ETag": etag})
+            if timings:
+                with collect_timings() as breakdown:
+                    result = await agent.run(request.query)
+                result = {**result, "timings": breakdown}
+            else:
+                result = await agent.run(request.query)
+        response = JSONResponse(result)
+        if etag is not None:
+            response.headers["ETag"] = etag
+        return response
+    except Overloaded as exc:
+        logger.warning("Rejected query: %s", exc)
+        raise _overloaded(exc) from exc
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    except Exception as exc:  # noqa: BLE001
+        logger.exception("Unhandled error in API")
+        raise HTTPException(status_code=500, detail=str(exc)) from exc
+
+
+@app.post("/api/v1/agent/query:batch")
+async def query_agent_batch(
+    request: BatchQueryRequest,
+    x_request_timeout: Optional[float] = Header(default=None),
+) -> dict:
+    if len(request.queries) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"Batch is limited to {MAX_BATCH_SIZE} queries")
+    try:
+        agent = get_agent()
+        logger.info("Batch received: %s queries", len(request.queries))
+        with request_deadline(_request_timeout(x_request_timeout)):
+            return {"results": await agent.run_batch(request.queries)}
+    except Exception as exc:  # noqa: BLE001
+        logger.exception("Unhandled error in API")
+        raise HTTPException(status_code=500, detail=str(exc)) from exc
+
+
+async def _ndjson_items(request: Request) -> AsyncIterator[dict]:
+    buffer = b""
+    line_number = 0
+    async for data in request.stream():
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                yield _decode_line(line, line_number)
+    if buffer.strip():
+        yield _decode_line(buffer, line_number + 1)
+
+
+def _decode_line(line: bytes, line_number: int) -> dict:
+    try:
+        return jsoncodec.loads(line)
+    except ValueError as exc:
+        raise ValueError(f"Line {line_number}: invalid JSON") from exc
+
+
+async def _json_items(body: bytes) -> AsyncIterator[dict]:
+    try:
+        payload = jsoncodec.loads(body)
+    except ValueError as exc:
+        raise ValueError("Request body is not valid JSON") from exc
+    if isinstance(payload, dict):
+        payload = payload.get("products")
+    if not isinstance(payload, list):
+        raise ValueError("Expected a list of products or {\"products\": [...]}")
+    for item in payload:
+        yield item
+
+
+@app.post("/api/v1/products:import")
+async def import_products(request: Request) -> dict:
+    """Bulk-load products from a JSON list or an NDJSON body (one product per line)."""
+    if "ndjson" in request.headers.get("content-type", ""):
+        items = _ndjson_items(request)
+    else:
+        items = _json_items(await request.body())
+    try:
+        return await get_agent().import_products(items)
+    except Overloaded as exc:
+        raise _overloaded(exc) from exc
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
     except Exception as exc:  # noqa: BLE001
         logger.exception("Unhandled error in API")
         raise HTTPException(status_code=500, detail=str(exc)) from exc
+
+
+@app.get("/healthz")
+async def healthz() -> dict:
+    """Liveness: the process is up and serving HTTP."""
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz() -> JSONResponse:
+    """Readiness: the agent is started and warmed; 503 before that and during shutdown."""
+    if not _ready:
+        return JSONResponse({"status": "starting"}, status_code=503)
+    return JSONResponse({"status": "ready", "startup_seconds": STARTUP.phases()})
+
+
+@app.get("/api/v1/agent/cache")
+async def cache_stats() -> dict:
+    return get_agent().cache_stats()
+
+
+@app.get("/api/v1/agent/admission")
+async def admission_stats() -> dict:
+    return get_agent().admission_stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> str:
+    try:
+        server_snapshots = await get_agent().server_metrics()
+    except Exception:  # noqa: BLE001
+        logger.exception("Could not collect MCP server metrics")
+        server_snapshots = []
+    return REGISTRY.render(server_snapshots)
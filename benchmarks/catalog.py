@@ -0,0 +1,111 @@
+"""Load time and peak memory of each store backend opening a large catalog file.
+
+Usage: python -m benchmarks.catalog [--products N] [--backends json,columnar,sqlite]
+       [--output results.json] [--baseline baseline.json]
+
+The catalog is written once to a temporary directory; every backend then
+opens it in a fresh interpreter, because peak RSS is a per-process high-water
+mark. ``load_peak_mb`` is the growth of the peak over the RSS right before the
+store is opened, ``retained_mb`` what is still held once it is loaded. The
+SQLite backend is measured importing the JSON file into a new database.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from agent import jsoncodec
+
+from .common import peak_rss_mb, save_and_compare, synthetic_products
+
+
+def _current_rss_mb() -> float:
+    """Resident set size right now (Linux); falls back to the peak elsewhere."""
+    try:
+        with open("/proc/self/statm", "r", encoding="ascii") as f:
+            pages = int(f.read().split()[1])
+    except OSError:
+        return peak_rss_mb()["self_mb"]
+    return round(pages * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+
+
+def measure_load(backend: str, path: str) -> dict:
+    """Open ``path`` with one backend in this process and report time and memory."""
+    from mcp_server.storage import ProductStore
+
+    if backend == "sqlite":
+        from mcp_server.sqlite_store import SQLiteProductStore
+
+        def open_store():
+            return SQLiteProductStore(os.path.splitext(path)[0] + ".db", import_from=path)
+    elif backend == "columnar":
+        from mcp_server.columnar import ColumnarProductStore
+
+        def open_store():
+            return ColumnarProductStore(path)
+    else:
+        def open_store():
+            return ProductStore(path)
+
+    before = _current_rss_mb()
+    started = time.perf_counter()
+    store = open_store()
+    elapsed = time.perf_counter() - started
+    result = {
+        "load_seconds": round(elapsed, 3),
+        "load_peak_mb": round(peak_rss_mb()["self_mb"] - before, 1),
+        "retained_mb": round(_current_rss_mb() - before, 1),
+        "count": store.get_statistics()["count"],
+    }
+    store.close()
+    return result
+
+
+def _measure_in_subprocess(backend: str, path: str) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.catalog", "--measure", backend, path],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=500000)
+    parser.add_argument("--backends", default="json,columnar,sqlite")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against results saved by an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown")
+    parser.add_argument("--measure", nargs=2, metavar=("BACKEND", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure_load(*args.measure)))
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "products.json")
+        catalog = [product.to_dict() for product in synthetic_products(args.products, args.seed)]
+        with open(path, "wb") as f:
+            f.write(jsoncodec.dump_bytes(catalog, indent=True))
+        del catalog
+        results = {
+            "config": {"products": args.products, "seed": args.seed},
+            "file_mb": round(os.path.getsize(path) / 2**20, 1),
+            "stores": {
+                backend: _measure_in_subprocess(backend, path) for backend in args.backends.split(",")
+            },
+        }
+    sys.exit(save_and_compare(results, args.output, args.baseline, args.tolerance))
+
+
+if __name__ == "__main__":
+    main()
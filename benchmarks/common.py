@@ -0,0 +1,113 @@
+"""Helpers shared by the benchmarks: synthetic catalogs, latency summaries,
+peak RSS and JSON result files that can be compared against a baseline."""
+from __future__ import annotations
+
+import json
+import random
+import resource
+import statistics
+import sys
+from typing import Any, Iterator, Optional
+
+from mcp_server.storage import Product
+
+
+_KINDS = (
+    "Ноутбук", "Смартфон", "Кофемашина", "Чайник", "Пылесос", "Телевизор", "Наушники", "Монитор",
+    "Клавиатура", "Мышь", "Холодильник", "Планшет", "Фен", "Утюг", "Микроволновка", "Роутер",
+)
+_BRANDS = (
+    "Lenovo", "Asus", "Samsung", "Apple", "Xiaomi", "Bosch", "Philips", "LG", "Sony", "Dell",
+    "HP", "Acer", "Huawei", "Tefal", "Braun", "Redmond",
+)
+CATEGORIES = (
+    "Электроника", "Бытовая техника", "Компьютеры", "Аудио", "Кухня", "Сетевое оборудование",
+    "Красота и здоровье", "Аксессуары",
+)
+# Metrics where a larger value is an improvement; all other numbers are costs.
+_HIGHER_IS_BETTER = ("per_second",)
+
+
+def synthetic_products(size: int, seed: int = 0) -> Iterator[Product]:
+    """``size`` products with ids 1..size, varied names, categories and prices."""
+    rng = random.Random(seed)
+    for product_id in range(1, size + 1):
+        yield Product(
+            id=product_id,
+            name=f"{rng.choice(_KINDS)} {rng.choice(_BRANDS)} {rng.randint(1, 9999)}",
+            # Log-uniform between 100 and 200 000, like real price lists.
+            price=round(100 * 2000 ** rng.random(), 2),
+            category=rng.choice(CATEGORIES),
+            in_stock=rng.random() < 0.8,
+        )
+
+
+def percentile(samples: list[float], percent: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+def latency_summary(samples: list[float]) -> dict:
+    """Count, mean and tail latencies in milliseconds of samples in seconds."""
+    if not samples:
+        return {"count": 0}
+    return {
+        "count": len(samples),
+        "mean_ms": round(statistics.mean(samples) * 1000, 3),
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 95) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+    }
+
+
+def peak_rss_mb() -> dict:
+    """Peak resident set size of this process and of its finished children."""
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    unit = 1 if sys.platform == "darwin" else 1024
+    return {
+        "self_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit / 2**20, 1),
+        "children_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit / 2**20, 1),
+    }
+
+
+def _numbers(value: Any, prefix: str = "") -> Iterator[tuple[str, float]]:
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from _numbers(item, f"{prefix}.{key}" if prefix else str(key))
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield prefix, float(value)
+
+
+def compare(results: dict, baseline: dict, tolerance: float = 0.25) -> list[str]:
+    """Describe the metrics that got worse than ``baseline`` by more than ``tolerance``.
+
+    Timing, throughput and memory numbers are compared; the ``config``
+    section and ``count``/``errors`` fields are not.
+    """
+    previous = dict(_numbers(baseline))
+    regressions = []
+    for name, value in _numbers(results):
+        last = name.rsplit(".", 1)[-1]
+        if name.startswith("config.") or last in ("count", "errors") or not previous.get(name):
+            continue
+        change = value / previous[name] - 1
+        if last.endswith(_HIGHER_IS_BETTER):
+            change = -change
+        if change > tolerance:
+            regressions.append(f"{name}: {previous[name]:g} -> {value:g} ({change:+.0%} worse)")
+    return regressions
+
+
+def save_and_compare(results: dict, output: Optional[str], baseline: Optional[str], tolerance: float) -> int:
+    """Print and optionally save results; return 1 if they regressed against the baseline."""
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+    if not baseline:
+        return 0
+    with open(baseline, "r", encoding="utf-8") as f:
+        regressions = compare(results, json.load(f), tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}", file=sys.stderr)
+    return 1 if regressions else 0
@@ -0,0 +1,162 @@
+"""Load test of the agent API, driven in-process with a concurrent client.
+
+Usage: python -m benchmarks.load [--products N] [--requests N] [--concurrency N]
+       [--transport inprocess|stdio] [--backend json|columnar|sqlite] [--cache]
+       [--output results.json] [--baseline baseline.json]
+
+A synthetic catalog is written to a temporary directory, ``api.main`` is
+started with its lifespan (MCP sessions included) and queries drawn from a
+weighted mix of the parser's intents are posted through an ASGI transport, so
+no port is opened. Latency percentiles are reported overall and per action,
+together with requests per second and peak RSS (the MCP server processes are
+"children" with the stdio transport).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+from agent import jsoncodec
+from agent.parser import parse_query
+
+from .common import CATEGORIES, latency_summary, peak_rss_mb, save_and_compare, synthetic_products
+
+
+# (weight, template) pairs; the action of each query is whatever the parser makes of it.
+_MIX = (
+    (20, "Товар id {id}"),
+    (15, "Какая средняя цена в категории {category}?"),
+    (5, "Какая средняя цена продуктов?"),
+    (15, "Найди {kind}"),
+    (10, "{k} самых дорогих товаров категории {category}"),
+    (5, "Товары цена от {price} до {price_high}"),
+    (10, "Посчитай скидку {percent}% на товар с ID {id}"),
+    (5, "Скидка {percent}% на ID {id}, {id2}, {id3}"),
+    (3, "Покажи продукты категории {category}"),
+    (2, "Добавь новый продукт: Товар {id}, цена {price}, категория {category}"),
+)
+_KINDS = ("ноутбук lenovo", "смартфн", "кофемашина", "наушники sony", "монитор dell")
+
+
+def query_mix(count: int, catalog_size: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    weights = [weight for weight, _ in _MIX]
+    queries = []
+    for template in rng.choices([template for _, template in _MIX], weights=weights, k=count):
+        price = rng.randint(100, 100000)
+        queries.append(template.format(
+            id=rng.randint(1, catalog_size),
+            id2=rng.randint(1, catalog_size),
+            id3=rng.randint(1, catalog_size),
+            category=rng.choice(CATEGORIES),
+            kind=rng.choice(_KINDS),
+            k=rng.choice((3, 5, 10)),
+            price=price,
+            price_high=price + 50,
+            percent=rng.choice((5, 10, 15, 20)),
+        ))
+    return queries
+
+
+async def _drive(queries: list[str], concurrency: int, warmup: int) -> dict:
+    # Imported here: the API and the MCP client read their configuration from
+    # the environment on import.
+    import httpx
+
+    from api import main
+
+    latencies: dict[str, list[float]] = defaultdict(list)
+    errors: dict[str, int] = defaultdict(int)
+    pending = iter(queries[warmup:])
+
+    async with main.lifespan(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+            async def post(query: str) -> tuple[bool, float]:
+                started = time.perf_counter()
+                response = await client.post("/api/v1/agent/query", json={"query": query})
+                return response.status_code == 200, time.perf_counter() - started
+
+            for query in queries[:warmup]:
+                await post(query)
+
+            async def worker() -> None:
+                for query in pending:
+                    ok, elapsed = await post(query)
+                    action = parse_query(query)["action"]
+                    latencies[action].append(elapsed)
+                    if not ok:
+                        errors[action] += 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            elapsed = time.perf_counter() - started
+
+    samples = [sample for action_samples in latencies.values() for sample in action_samples]
+    return {
+        "overall": {
+            **latency_summary(samples),
+            "errors": sum(errors.values()),
+            "requests_per_second": round(len(samples) / elapsed, 1),
+        },
+        "actions": {
+            action: {**latency_summary(action_samples), "errors": errors[action]}
+            for action, action_samples in sorted(latencies.items())
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--transport", choices=("inprocess", "stdio"), default="inprocess")
+    parser.add_argument("--backend", choices=("json", "columnar", "sqlite"), default="json")
+    parser.add_argument("--cache", action="store_true", help="keep the agent response cache enabled")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against results saved by an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "products.json")
+        started = time.perf_counter()
+        catalog = [product.to_dict() for product in synthetic_products(args.products, args.seed)]
+        with open(path, "wb") as f:
+            f.write(jsoncodec.dump_bytes(catalog))
+        del catalog
+        seed_seconds = time.perf_counter() - started
+        os.environ.update({
+            "PRODUCTS_PATH": path,
+            "PRODUCTS_BACKEND": args.backend,
+            "MCP_TRANSPORT": args.transport,
+            "AGENT_CACHE_SIZE": os.environ.get("AGENT_CACHE_SIZE", "256") if args.cache else "0",
+            # Admission limits would turn a deliberate overload into 429s.
+            "AGENT_MAX_QUEUE": str(max(args.concurrency, 128)),
+            "LOG_LEVEL": "WARNING",
+        })
+        queries = query_mix(args.requests + args.warmup, args.products, args.seed)
+        results = asyncio.run(_drive(queries, args.concurrency, args.warmup))
+
+    config = {key: value for key, value in vars(args).items() if key not in ("output", "baseline")}
+    results = {
+        "config": config,
+        "catalog_write_seconds": round(seed_seconds, 3),
+        **results,
+        "peak_rss": peak_rss_mb(),
+    }
+    sys.exit(save_and_compare(results, args.output, args.baseline, args.tolerance))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Compare MCP tool-call latency over the stdio and in-process transports.
+
+Usage: python -m benchmarks.mcp_transport [--calls N] [--concurrency N]
+
+The catalog is written to a temporary file so the benchmark never touches
+``data/products.json``.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+from dataclasses import asdict
+
+from agent.mcp_client import MCPClient
+from mcp_server.storage import DEFAULT_PRODUCTS
+
+from .common import percentile
+
+
+async def _measure(client: MCPClient, calls: int, concurrency: int) -> dict:
+    await client.start()
+    # One warm-up call per session so lazy server initialization is excluded.
+    await client.call_tool_on_all("get_catalog_version", {})
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+
+    async def call(index: int) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            await client.call_tool("get_product", {"product_id": 1 + index % len(DEFAULT_PRODUCTS)})
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(call(index) for index in range(calls)))
+    finally:
+        await client.aclose()
+    elapsed = time.perf_counter() - started
+    return {
+        "calls_per_second": round(calls / elapsed, 1),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 3),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--pool-size", type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "products.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump([asdict(product) for product in DEFAULT_PRODUCTS], f)
+        # The in-process server reads its configuration on import.
+        os.environ["PRODUCTS_PATH"] = path
+
+        results = {}
+        for transport in ("stdio", "inprocess"):
+            client = MCPClient(pool_size=args.pool_size, env={"PRODUCTS_PATH": path}, transport=transport)
+            results[transport] = asyncio.run(_measure(client, args.calls, args.concurrency))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Micro-benchmarks of the parser, formatting, the calculator and every store operation.
+
+Usage: python -m benchmarks.micro [--products N] [--backends json,columnar,sqlite]
+       [--output results.json] [--baseline baseline.json]
+
+Each store backend is loaded with the same synthetic catalog in a temporary
+directory; reads run many times, writes a few times (a non-journaled JSON
+store rewrites its file on every add).
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import timeit
+from typing import Callable
+
+from agent.parser import parse_query
+from agent.tools import DISCOUNT_EXPRESSION, calculator, calculator_batch, format_products
+from mcp_server.storage import CatalogStore, ProductStore
+
+from .common import CATEGORIES, peak_rss_mb, save_and_compare, synthetic_products
+
+
+def measure(func: Callable[[], object], number: int, repeat: int = 3) -> float:
+    """Best-of-``repeat`` time of one call, in microseconds."""
+    best = min(timeit.repeat(func, number=number, repeat=repeat))
+    return round(best / number * 1e6, 3)
+
+
+def _core_benchmarks(number: int) -> dict:
+    products = [product.to_dict() for product in synthetic_products(100)]
+    prices = [product["price"] for product in products]
+    return {
+        "parse_query_us": measure(lambda: parse_query("5 самых дорогих товаров категории Электроника"), number),
+        "format_products_100_us": measure(lambda: format_products(products), max(1, number // 10)),
+        "calculator_literal_us": measure(lambda: calculator("100 * (1 - 15 / 100)"), number),
+        "calculator_template_us": measure(
+            lambda: calculator(DISCOUNT_EXPRESSION, {"price": 100, "percent": 15}), number
+        ),
+        "calculator_batch_100_us": measure(
+            lambda: calculator_batch(DISCOUNT_EXPRESSION, {"price": prices, "percent": 15}), max(1, number // 10)
+        ),
+    }
+
+
+def _open_store(backend: str, directory: str, size: int) -> CatalogStore:
+    path = os.path.join(directory, f"{backend}.json")
+    if backend == "sqlite":
+        from mcp_server.sqlite_store import SQLiteProductStore
+
+        store = SQLiteProductStore(os.path.join(directory, "products.db"))
+    elif backend == "columnar":
+        from mcp_server.columnar import ColumnarProductStore
+
+        store = ColumnarProductStore(path)
+    else:
+        store = ProductStore(path)
+    store.seed(synthetic_products(size))
+    return store
+
+
+def _store_benchmarks(backend: str, size: int, number: int, writes: int) -> dict:
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as directory:
+        started = time.perf_counter()
+        store = _open_store(backend, directory, size)
+        results: dict = {"seed_seconds": round(time.perf_counter() - started, 3)}
+        ids = [rng.randint(1, size) for _ in range(100)]
+        category = CATEGORIES[0]
+        operations: dict[str, tuple[Callable[[], object], int]] = {
+            "get_product_us": (lambda: store.get_product(rng.randint(1, size)), number),
+            "get_products_100_us": (lambda: store.get_products(ids), max(1, number // 10)),
+            "list_products_page_us": (lambda: store.list_products(offset=size // 2, limit=20), number),
+            "list_products_category_page_us": (lambda: store.list_products(category=category, limit=20), number),
+            "list_products_json_page_us": (lambda: store.list_products_json(limit=20), number),
+            "search_products_us": (lambda: store.search_products("ноутбк lenovo"), max(1, number // 10)),
+            "top_10_by_price_us": (lambda: store.list_products_by_price(order="desc", limit=10), number),
+            "price_range_us": (
+                lambda: store.list_products_by_price(min_price=1000, max_price=1010, category=category), number
+            ),
+            "get_statistics_us": (lambda: store.get_statistics(), max(1, number // 10)),
+            "get_statistics_category_us": (lambda: store.get_statistics(category=category), number),
+            "catalog_version_us": (lambda: store.catalog_version(), number),
+            "add_product_us": (
+                lambda: store.add_product(name="Bench", price=rng.randint(100, 1000), category=category), writes
+            ),
+            "add_products_100_us": (
+                lambda: store.add_products([{"name": "Bench", "price": 100, "category": category}] * 100), writes
+            ),
+        }
+        for name, (func, count) in operations.items():
+            results[name] = measure(func, count, repeat=1 if name.startswith("add_") else 3)
+        store.close()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--backends", default="json,columnar,sqlite")
+    parser.add_argument("--number", type=int, default=1000, help="calls per read benchmark")
+    parser.add_argument("--writes", type=int, default=5, help="calls per write benchmark")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against results saved by an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown")
+    args = parser.parse_args()
+
+    results = {
+        "config": {"products": args.products, "number": args.number, "writes": args.writes},
+        "core": _core_benchmarks(args.number),
+        "stores": {
+            backend: _store_benchmarks(backend, args.products, args.number, args.writes)
+            for backend in args.backends.split(",")
+        },
+        "peak_rss": peak_rss_mb(),
+    }
+    sys.exit(save_and_compare(results, args.output, args.baseline, args.tolerance))
+
+
+if __name__ == "__main__":
+    main()
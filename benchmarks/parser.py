@@ -0,0 +1,90 @@
+"""Micro-benchmark of query parsing and the ``analyze`` decision path.
+
+Usage: python -m benchmarks.parser [--queries N] [--distinct N]
+
+Compares the uncached parser, the cached ``parse_query``, the old chat-message
+path (``MockLLM.invoke`` plus ``json.loads``) and ``MockLLM.decide``.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+from typing import Callable
+
+from langchain_core.messages import HumanMessage
+
+from agent import parser
+from agent.mock_llm import MockLLM
+
+
+_TEMPLATES = (
+    "Покажи все продукты",
+    "Покажи все продукты в категории {category}",
+    "Какая средняя цена продуктов?",
+    "Какая средняя цена в категории {category}?",
+    "Статистика по категории {category}",
+    "Добавь новый продукт: Товар {n}, цена {price}, категория {category}",
+    "Посчитай скидку {percent}% на товар с ID {n}",
+    "Скидка {percent}% на ID {n}, {m}, {k}",
+    "Скидка {percent}% на все товары категории {category}",
+    "Товар id {n}",
+    "Привет",
+)
+_CATEGORIES = ("Электроника", "Бытовая техника", "Книги", "Одежда")
+
+
+def corpus(size: int, distinct: int, seed: int = 0) -> list[str]:
+    """``size`` queries drawn from ``distinct`` generated ones, skewed like real traffic."""
+    rng = random.Random(seed)
+    pool = [
+        rng.choice(_TEMPLATES).format(
+            category=rng.choice(_CATEGORIES),
+            n=rng.randint(1, 1000),
+            m=rng.randint(1, 1000),
+            k=rng.randint(1, 1000),
+            price=rng.randint(100, 100000),
+            percent=rng.choice((5, 10, 15, 20, 50)),
+        )
+        for _ in range(distinct)
+    ]
+    weights = [1 / (rank + 1) for rank in range(distinct)]
+    return rng.choices(pool, weights=weights, k=size)
+
+
+def _measure(name: str, func: Callable[[str], object], queries: list[str]) -> dict:
+    started = time.perf_counter()
+    for query in queries:
+        func(query)
+    elapsed = time.perf_counter() - started
+    return {"name": name, "us_per_query": round(elapsed / len(queries) * 1e6, 2)}
+
+
+def main() -> None:
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument("--queries", type=int, default=20000)
+    argparser.add_argument("--distinct", type=int, default=500)
+    args = argparser.parse_args()
+
+    queries = corpus(args.queries, args.distinct)
+    llm = MockLLM()
+
+    def uncached(query: str) -> object:
+        return parser._parse(parser.normalize_query(query))
+
+    def via_message(query: str) -> object:
+        return json.loads(llm.invoke([HumanMessage(query)]).content)
+
+    results = [
+        _measure("parse (uncached)", uncached, queries),
+        _measure("parse_query (cached)", parser.parse_query, queries),
+        # The chat model path is slow; a tenth of the corpus is enough.
+        _measure("MockLLM.invoke + json.loads", via_message, queries[: max(1, len(queries) // 10)]),
+        _measure("MockLLM.decide", llm.decide, queries),
+    ]
+    print(json.dumps({"queries": args.queries, "distinct": args.distinct, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
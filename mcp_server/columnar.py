@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+
+from .price_index import PriceIndex
+from .search import TrigramIndex
+from .storage import Product, ProductStore
+
+
+_INITIAL_CAPACITY = 1024
+
+
+class ColumnarProductStore(ProductStore):
+    """ProductStore that keeps the catalog in NumPy columns.
+
+    Ids, prices and stock flags live in typed arrays, categories are
+    dictionary-encoded to integer codes and names are stored as UTF-8 in one
+    buffer addressed by an offsets array. Filters and statistics are vectorized
+    masks and reductions; rows are only turned into dicts for the returned page.
+    Persistence (snapshot and journal) is inherited from ``ProductStore``.
+    """
+
+    def _replace_all(self, products: Iterable[Product]) -> None:
+        ids: list[int] = []
+        prices: list[float] = []
+        in_stock: list[bool] = []
+        codes: list[int] = []
+        lengths: list[int] = [0]
+        self._categories: list[str] = []
+        self._category_codes: dict[str, int] = {}
+        self._search = TrigramIndex()
+        self._price_index = PriceIndex()
+        names = bytearray()
+        for product in products:
+            encoded = product.name.encode("utf-8")
+            ids.append(product.id)
+            prices.append(product.price)
+            in_stock.append(product.in_stock)
+            codes.append(self._category_code(product.category))
+            lengths.append(len(encoded))
+            names += encoded
+            self._search.add(product.id, product.name)
+            self._price_index.add(product.id, product.price, product.category, product.in_stock)
+
+        size = len(ids)
+        capacity = max(_INITIAL_CAPACITY, size)
+        self._ids = np.zeros(capacity, dtype=np.int64)
+        self._prices = np.zeros(capacity, dtype=np.float64)
+        self._in_stock = np.zeros(capacity, dtype=np.bool_)
+        self._codes = np.zeros(capacity, dtype=np.int32)
+        self._name_offsets = np.zeros(capacity + 1, dtype=np.int64)
+        self._ids[:size] = ids
+        self._prices[:size] = prices
+        self._in_stock[:size] = in_stock
+        self._codes[:size] = codes
+        self._name_offsets[: size + 1] = np.cumsum(lengths)
+        self._names = names
+        self._size = size
+        self._ids_sorted = bool(np.all(np.diff(self._ids[:size]) > 0))
+        self._next_id = int(self._ids[:size].max()) + 1 if size else 1
+
+    def _category_code(self, category: str) -> int:
+        code = self._category_codes.get(category)
+        if code is None:
+            code = len(self._categories)
+            self._categories.append(category)
+            self._category_codes[category] = code
+        return code
+
+    def _grow(self) -> None:
+        capacity = max(_INITIAL_CAPACITY, 2 * len(self._ids))
+        self._ids = np.resize(self._ids, capacity)
+        self._prices = np.resize(self._prices, capacity)
+        self._in_stock = np.resize(self._in_stock, capacity)
+        self._codes = np.resize(self._codes, capacity)
+        self._name_offsets = np.resize(self._name_offsets, capacity + 1)
+
+    def _insert(self, product: Product) -> None:
+        row = self._size
+        if row == len(self._ids):
+            self._grow()
+        if row and product.id <= self._ids[row - 1]:
+            self._ids_sorted = False
+        self._ids[row] = product.id
+        self._prices[row] = product.price
+        self._in_stock[row] = product.in_stock
+        self._codes[row] = self._category_code(product.category)
+        self._names += product.name.encode("utf-8")
+        self._name_offsets[row + 1] = len(self._names)
+        self._size = row + 1
+        self._search.add(product.id, product.name)
+        self._price_index.add(product.id, product.price, product.category, product.in_stock)
+
+    def _find_row(self, product_id: int) -> Optional[int]:
+        ids = self._ids[: self._size]
+        if self._ids_sorted:
+            row = int(np.searchsorted(ids, product_id))
+            return row if row < len(ids) and ids[row] == product_id else None
+        rows = np.flatnonzero(ids == product_id)
+        return int(rows[0]) if len(rows) else None
+
+    def _contains(self, product_id: int) -> bool:
+        return self._find_row(product_id) is not None
+
+    def _row(self, row: int) -> dict:
+        start, end = self._name_offsets[row], self._name_offsets[row + 1]
+        return {
+            "id": int(self._ids[row]),
+            "name": self._names[start:end].decode("utf-8"),
+            "price": float(self._prices[row]),
+            "category": self._categories[self._codes[row]],
+            "in_stock": bool(self._in_stock[row]),
+        }
+
+    def _iter_products(self) -> Iterator[Product]:
+        for row in range(self._size):
+            yield Product(**self._row(row))
+
+    def _mask(
+        self,
+        category: Optional[str] = None,
+        in_stock: Optional[bool] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        start: int = 0,
+        stop: Optional[int] = None,
+    ) -> np.ndarray:
+        """Filter mask over rows ``start:stop`` (all rows by default)."""
+        stop = self._size if stop is None else stop
+        mask = np.ones(stop - start, dtype=np.bool_)
+        if category is not None:
+            code = self._category_codes.get(category)
+            if code is None:
+                return np.zeros(stop - start, dtype=np.bool_)
+            mask &= self._codes[start:stop] == code
+        if in_stock is not None:
+            mask &= self._in_stock[start:stop] == in_stock
+        if min_price is not None:
+            mask &= self._prices[start:stop] >= min_price
+        if max_price is not None:
+            mask &= self._prices[start:stop] <= max_price
+        return mask
+
+    def _row_after(self, after_id: int) -> int:
+        """Row right after the product ``after_id`` (catalog order)."""
+        if self._ids_sorted:
+            return int(np.searchsorted(self._ids[: self._size], after_id, side="right"))
+        row = self._find_row(after_id)
+        return self._size if row is None else row + 1
+
+    def list_products(
+        self,
+        category: Optional[str] = None,
+        in_stock: Optional[bool] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        after_id: Optional[int] = None,
+    ) -> list[dict]:
+        """Return products in catalog order, filtered and paged.
+
+        A page is searched for in growing windows of rows starting at
+        ``after_id``, so paging through the catalog with that cursor masks
+        each row about once instead of the whole catalog per page.
+        """
+        self._refresh()
+        offset = max(0, offset)
+        stop = None if limit is None else offset + max(0, limit)
+        start = 0 if after_id is None else self._row_after(after_id)
+        if stop is None:
+            rows = np.flatnonzero(self._mask(category, in_stock, min_price, max_price, start)) + start
+            return [self._row(int(row)) for row in rows[offset:]]
+        found: list[np.ndarray] = []
+        count, window = 0, max(_INITIAL_CAPACITY, 2 * stop)
+        while start < self._size and count < stop:
+            end = min(self._size, start + window)
+            rows = np.flatnonzero(self._mask(category, in_stock, min_price, max_price, start, end)) + start
+            found.append(rows)
+            count += len(rows)
+            start, window = end, 2 * window
+        rows = np.concatenate(found) if found else np.zeros(0, dtype=np.int64)
+        return [self._row(int(row)) for row in rows[offset:stop]]
+
+    def get_product(self, product_id: int) -> dict:
+        self._refresh()
+        row = self._find_row(product_id)
+        if row is None:
+            raise ValueError(f"Product with id={product_id} not found")
+        return self._row(row)
+
+    def get_products(self, product_ids: Iterable[int]) -> list[dict]:
+        self._refresh()
+        requested = np.fromiter(product_ids, dtype=np.int64)
+        if not self._ids_sorted:
+            rows = (self._find_row(int(product_id)) for product_id in requested)
+            return [self._row(row) for row in rows if row is not None]
+        ids = self._ids[: self._size]
+        rows = np.minimum(np.searchsorted(ids, requested), max(0, len(ids) - 1))
+        found = ids[rows] == requested if len(ids) else np.zeros(len(requested), dtype=np.bool_)
+        return [self._row(int(row)) for row in rows[found]]
+
+    @staticmethod
+    def _summarize(prices: np.ndarray, in_stock: np.ndarray) -> dict:
+        count = int(len(prices))
+        return {
+            "count": count,
+            "average_price": float(prices.mean()) if count else 0.0,
+            "min_price": float(prices.min()) if count else None,
+            "max_price": float(prices.max()) if count else None,
+            "in_stock_count": int(np.count_nonzero(in_stock)),
+        }
+
+    def get_statistics(self, category: Optional[str] = None) -> dict:
+        self._refresh()
+        size = self._size
+        prices, in_stock, codes = self._prices[:size], self._in_stock[:size], self._codes[:size]
+        if category is not None:
+            mask = self._mask(category=category)
+            stats = self._summarize(prices[mask], in_stock[mask])
+            stats["category"] = category
+            return stats
+
+        stats = self._summarize(prices, in_stock)
+        buckets = len(self._categories)
+        counts = np.bincount(codes, minlength=buckets)
+        totals = np.bincount(codes, weights=prices, minlength=buckets)
+        stocked = np.bincount(codes, weights=in_stock, minlength=buckets)
+        mins = np.full(buckets, np.inf)
+        maxs = np.full(buckets, -np.inf)
+        np.minimum.at(mins, codes, prices)
+        np.maximum.at(maxs, codes, prices)
+        stats["categories"] = {
+            name: {
+                "count": int(counts[code]),
+                "average_price": float(totals[code] / counts[code]),
+                "min_price": float(mins[code]),
+                "max_price": float(maxs[code]),
+                "in_stock_count": int(stocked[code]),
+            }
+            for code, name in enumerate(self._categories)
+            if counts[code]
+        }
+        return stats
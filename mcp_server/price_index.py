@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right
+from typing import Iterable, Optional
+
+
+# A batch at most this large is merged by binary insertion; bigger batches are
+# sorted together with the existing entries in one pass.
+_INSORT_LIMIT = 32
+
+
+def descending_order(order: str) -> bool:
+    """Validate a sort order ("asc" or "desc") and tell whether it is descending.
+
+    Raises:
+        ValueError: If ``order`` is anything else.
+    """
+    if order not in ("asc", "desc"):
+        raise ValueError(f"order must be 'asc' or 'desc', got {order!r}")
+    return order == "desc"
+
+
+class _SortedPrices:
+    """Product ids ordered by (price, id), kept as two parallel lists."""
+
+    def __init__(self) -> None:
+        self._prices: list[float] = []
+        self._ids: list[int] = []
+
+    def add_many(self, entries: list[tuple[float, int]]) -> None:
+        if len(entries) <= _INSORT_LIMIT:
+            for price, product_id in entries:
+                # Equal prices stay in id order; new ids are normally the largest.
+                low = bisect_left(self._prices, price)
+                position = bisect_right(self._prices, price)
+                while position > low and self._ids[position - 1] > product_id:
+                    position -= 1
+                self._prices.insert(position, price)
+                self._ids.insert(position, product_id)
+            return
+        merged = sorted([*zip(self._prices, self._ids), *entries])
+        self._prices = [price for price, _ in merged]
+        self._ids = [product_id for _, product_id in merged]
+
+    def select(
+        self,
+        min_price: Optional[float],
+        max_price: Optional[float],
+        descending: bool,
+        limit: Optional[int],
+    ) -> list[int]:
+        low = 0 if min_price is None else bisect_left(self._prices, min_price)
+        high = len(self._prices) if max_price is None else bisect_right(self._prices, max_price)
+        if high <= low:
+            return []
+        if descending:
+            start = low if limit is None else max(low, high - limit)
+            return self._ids[start:high][::-1]
+        stop = high if limit is None else min(high, low + limit)
+        return self._ids[low:stop]
+
+
+class PriceIndex:
+    """Sorted price index for range and top-k queries.
+
+    One sorted list is kept per filter combination (all products, per
+    category, per stock status and per both), so a filtered query is a binary
+    search plus a slice of the result. Adds are buffered and merged on the
+    next query: a few by binary insertion, a bulk load by a single sort.
+    """
+
+    def __init__(self) -> None:
+        self._lists: dict[tuple[Optional[str], Optional[bool]], _SortedPrices] = {}
+        self._pending: dict[tuple[Optional[str], Optional[bool]], list[tuple[float, int]]] = {}
+
+    def add(self, product_id: int, price: float, category: str, in_stock: bool) -> None:
+        entry = (price, product_id)
+        for key in ((None, None), (category, None), (None, in_stock), (category, in_stock)):
+            self._pending.setdefault(key, []).append(entry)
+
+    def add_many(self, items: Iterable[tuple[int, float, str, bool]]) -> None:
+        for product_id, price, category, in_stock in items:
+            self.add(product_id, price, category, in_stock)
+
+    def clear(self) -> None:
+        self._lists.clear()
+        self._pending.clear()
+
+    def select(
+        self,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        category: Optional[str] = None,
+        in_stock: Optional[bool] = None,
+        descending: bool = False,
+        limit: Optional[int] = None,
+    ) -> list[int]:
+        """Ids of products priced within [min_price, max_price], cheapest first
+        (or most expensive first with ``descending``), at most ``limit`` of them."""
+        key = (category, in_stock)
+        pending = self._pending.pop(key, None)
+        if pending:
+            self._lists.setdefault(key, _SortedPrices()).add_many(sorted(pending))
+        prices = self._lists.get(key)
+        if prices is None or (limit is not None and limit <= 0):
+            return []
+        return prices.select(min_price, max_price, descending, limit)
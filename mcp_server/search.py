@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import math
+import re
+from bisect import bisect_left
+from collections import Counter
+from typing import Iterable
+
+
+_WORD_RE = re.compile(r"\w+")
+# Share of the query's trigrams a name must contain to count as a match; low
+# enough to tolerate a typo in a short word.
+_MIN_OVERLAP = 0.4
+
+
+def _tokens(text: str) -> list[str]:
+    return _WORD_RE.findall(text.casefold().replace("ё", "е"))
+
+
+def trigrams(text: str) -> set[str]:
+    """Case-folded trigrams of every word, padded so word starts and ends count."""
+    grams: set[str] = set()
+    for token in _tokens(text):
+        padded = f"  {token} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _contains(postings: list[int], product_id: int) -> bool:
+    index = bisect_left(postings, product_id)
+    return index < len(postings) and postings[index] == product_id
+
+
+class TrigramIndex:
+    """Inverted index from name trigrams to product ids for fuzzy search.
+
+    Adding a product only touches the posting lists of its own trigrams, and
+    a search only reads the posting lists of the query's trigrams, so neither
+    scans the catalog. Matches are ranked by trigram similarity (Jaccard).
+
+    A match must share a minimum number of trigrams with the query, so it has
+    to appear in at least one of the rarest few. Those posting lists give the
+    candidates; the remaining (longer) lists only add counts for candidates,
+    by binary search when there are few of them (posting lists stay sorted).
+    """
+
+    def __init__(self) -> None:
+        self._postings: dict[str, list[int]] = {}
+        self._sizes: dict[int, int] = {}
+        self._unsorted: set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self._sizes)
+
+    def add(self, product_id: int, text: str) -> None:
+        grams = trigrams(text)
+        self._sizes[product_id] = len(grams)
+        for gram in grams:
+            postings = self._postings.setdefault(gram, [])
+            if postings and postings[-1] > product_id:
+                self._unsorted.add(gram)
+            postings.append(product_id)
+
+    def add_many(self, items: Iterable[tuple[int, str]]) -> None:
+        for product_id, text in items:
+            self.add(product_id, text)
+
+    def clear(self) -> None:
+        self._postings.clear()
+        self._sizes.clear()
+        self._unsorted.clear()
+
+    def search(self, text: str, limit: int = 10) -> list[int]:
+        """Return up to ``limit`` product ids, best match first."""
+        grams = trigrams(text)
+        if not grams or limit <= 0:
+            return []
+        for gram in grams & self._unsorted:
+            self._postings[gram].sort()
+        self._unsorted -= grams
+
+        lists = sorted((self._postings.get(gram, []) for gram in grams), key=len)
+        required = max(1, math.ceil(len(grams) * _MIN_OVERLAP))
+        probe = len(lists) - required + 1
+        hits: Counter[int] = Counter()
+        for postings in lists[:probe]:
+            hits.update(postings)
+        for postings in lists[probe:]:
+            if len(hits) * 16 < len(postings):
+                shared = [product_id for product_id in hits if _contains(postings, product_id)]
+            else:
+                shared = hits.keys() & postings
+            hits.update(shared)
+
+        scored = [
+            (shared / (len(grams) + self._sizes[product_id] - shared), product_id)
+            for product_id, shared in hits.items()
+            if shared >= required
+        ]
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [product_id for _, product_id in scored[:limit]]
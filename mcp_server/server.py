@@ -1,50 +1,223 @@
 from __future__ import annotations
 
+import atexit
 import logging
 import os
-from fastmcp import FastMCP
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
 
-from .storage import ProductStore
+from agent.metrics import REGISTRY
+from agent.startup import STARTUP
+
+with STARTUP.phase("import fastmcp"):
+    from fastmcp import FastMCP
+    from fastmcp.tools import ToolResult
+    from mcp.types import TextContent
+
+with STARTUP.phase("import storage"):
+    from .storage import CatalogStore, ProductStore
 
 
 DATA_PATH = os.environ.get("PRODUCTS_PATH", os.path.join(os.path.dirname(__file__), "..", "data", "products.json"))
+STORAGE_BACKEND = os.environ.get("PRODUCTS_BACKEND", "json").lower()
+
+JOURNAL_ENABLED = os.environ.get("PRODUCTS_JOURNAL", "0").lower() in {"1", "true", "yes"}
+JOURNAL_FSYNC_EVERY = int(os.environ.get("PRODUCTS_JOURNAL_FSYNC_EVERY", "1"))
+JOURNAL_COMPACT_THRESHOLD = int(os.environ.get("PRODUCTS_JOURNAL_COMPACT_THRESHOLD", "1000"))
+
+DB_PATH = os.environ.get("PRODUCTS_DB_PATH", os.path.splitext(DATA_PATH)[0] + ".db")
+
+
+def _create_store() -> CatalogStore:
+    if STORAGE_BACKEND == "sqlite":
+        from .sqlite_store import SQLiteProductStore
 
-store = ProductStore(os.path.abspath(DATA_PATH))
+        return SQLiteProductStore(os.path.abspath(DB_PATH), import_from=os.path.abspath(DATA_PATH))
+
+    if STORAGE_BACKEND == "columnar":
+        # NumPy is only needed for the columnar backend.
+        from .columnar import ColumnarProductStore
+
+        store_class: type[ProductStore] = ColumnarProductStore
+    elif STORAGE_BACKEND == "json":
+        store_class = ProductStore
+    else:
+        raise ValueError(f"Unknown PRODUCTS_BACKEND: {STORAGE_BACKEND}")
+    return store_class(
+        os.path.abspath(DATA_PATH),
+        journal=JOURNAL_ENABLED,
+        fsync_every=JOURNAL_FSYNC_EVERY,
+        compact_threshold=JOURNAL_COMPACT_THRESHOLD,
+    )
+
+
+STORE_METRIC = "store_operation_duration_seconds"
+
+with STARTUP.phase("load store"), REGISTRY.time(STORE_METRIC, operation="load"):
+    store = _create_store()
+atexit.register(store.close)
 
 mcp = FastMCP("ProductMCP")
 logger = logging.getLogger(__name__)
 
+# FastMCP runs sync tools in a thread pool; with the in-process transport
+# several client sessions share this store, so calls into it are serialized.
+_store_lock = threading.Lock()
+
+
+@contextmanager
+def _store_operation(operation: str) -> Iterator[None]:
+    with _store_lock, REGISTRY.time(STORE_METRIC, operation=operation):
+        yield
+
+
+def _encoded(text: str) -> ToolResult:
+    """Wrap pre-encoded JSON so FastMCP sends it without serializing again."""
+    return ToolResult(content=[TextContent(type="text", text=text)])
+
 
 @mcp.tool()
-def list_products() -> list[dict]:
-    """Return all available products."""
-    logger.info("list_products called")
-    return store.list_products()
+def list_products(
+    category: Optional[str] = None,
+    in_stock: Optional[bool] = None,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    after_id: Optional[int] = None,
+) -> ToolResult:
+    """Return products, optionally filtered by category and stock status.
+
+    Results keep catalog order; ``offset``/``limit`` select a page of them.
+    To walk the whole catalog, pass the id of the last product received as
+    ``after_id`` instead of a growing ``offset``.
+    """
+    logger.info(
+        "list_products called category=%s in_stock=%s offset=%s limit=%s after_id=%s",
+        category, in_stock, offset, limit, after_id,
+    )
+    with _store_operation("list_products"):
+        return _encoded(
+            store.list_products_json(
+                category=category, in_stock=in_stock, offset=offset, limit=limit, after_id=after_id
+            )
+        )
 
 
 @mcp.tool()
-def get_product(product_id: int) -> dict:
+def get_product(product_id: int) -> ToolResult:
     """Return a single product by ID.
 
     Raises:
         ValueError: If the product is not found.
     """
     logger.info("get_product called id=%s", product_id)
-    return store.get_product(product_id)
+    with _store_operation("get_product"):
+        return _encoded(store.get_product_json(product_id))
+
+
+@mcp.tool()
+def get_products(product_ids: list[int]) -> list[dict]:
+    """Return several products by ID in one call, in the requested order.
+
+    Unknown IDs are left out of the result.
+    """
+    logger.info("get_products called ids=%s", len(product_ids))
+    with _store_operation("get_products"):
+        return store.get_products(product_ids)
+
+
+@mcp.tool()
+def search_products(text: str, limit: int = 10) -> list[dict]:
+    """Find products by name, best match first; tolerates case and small typos."""
+    logger.info("search_products called text=%s limit=%s", text, limit)
+    with _store_operation("search_products"):
+        return store.search_products(text, limit=limit)
+
+
+@mcp.tool()
+def list_products_by_price(
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    category: Optional[str] = None,
+    in_stock: Optional[bool] = None,
+    order: str = "asc",
+    limit: Optional[int] = None,
+) -> list[dict]:
+    """Return products sorted by price, optionally within a price range.
+
+    ``order`` is "asc" (cheapest first) or "desc" (most expensive first); with
+    ``limit`` this gives the k cheapest or most expensive products. Category and
+    stock filters can be combined with the range.
+
+    Raises:
+        ValueError: If ``order`` is not "asc" or "desc".
+    """
+    logger.info(
+        "list_products_by_price called min=%s max=%s category=%s in_stock=%s order=%s limit=%s",
+        min_price, max_price, category, in_stock, order, limit,
+    )
+    with _store_operation("list_products_by_price"):
+        return store.list_products_by_price(
+            min_price=min_price,
+            max_price=max_price,
+            category=category,
+            in_stock=in_stock,
+            order=order,
+            limit=limit,
+        )
 
 
 @mcp.tool()
 def add_product(name: str, price: float, category: str, in_stock: bool = True) -> dict:
     """Add a new product and return it."""
     logger.info("add_product called name=%s price=%s category=%s in_stock=%s", name, price, category, in_stock)
-    return store.add_product(name=name, price=price, category=category, in_stock=in_stock)
+    with _store_operation("add_product"):
+        return store.add_product(name=name, price=price, category=category, in_stock=in_stock)
+
+
+@mcp.tool()
+def add_products(items: list[dict]) -> dict:
+    """Add many products at once and return how many were added and their ids.
+
+    Each item has ``name``, ``price``, ``category`` and optionally ``in_stock``.
+    The batch is validated as a whole and persisted with a single write.
+
+    Raises:
+        ValueError: If an item is invalid; nothing is added then.
+    """
+    logger.info("add_products called items=%s", len(items))
+    with _store_operation("add_products"):
+        created = store.add_products(items)
+    return {
+        "added": len(created),
+        "first_id": created[0]["id"] if created else None,
+        "last_id": created[-1]["id"] if created else None,
+    }
+
+
+@mcp.tool()
+def get_statistics(category: Optional[str] = None) -> ToolResult:
+    """Return product statistics (count, average/min/max price, in-stock count).
+
+    Without a category the result covers the whole catalog and includes a
+    per-category breakdown.
+    """
+    logger.info("get_statistics called category=%s", category)
+    with _store_operation("get_statistics"):
+        return _encoded(store.get_statistics_json(category=category))
+
+
+@mcp.tool()
+def get_catalog_version() -> dict:
+    """Return a version token that changes whenever the catalog is modified."""
+    with _store_operation("catalog_version"):
+        return {"version": store.catalog_version()}
 
 
 @mcp.tool()
-def get_statistics() -> dict:
-    """Return product statistics (count and average price)."""
-    logger.info("get_statistics called")
-    return store.get_statistics()
+def get_metrics() -> dict:
+    """Return this server process's latency histograms and counters."""
+    return REGISTRY.snapshot()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,376 @@
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+from typing import Iterable, Iterator, Optional
+
+from agent import jsoncodec
+
+from .price_index import descending_order
+from .search import TrigramIndex
+from .storage import DEFAULT_PRODUCTS, Product, SnapshotCache, validate_product_fields
+
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    price REAL NOT NULL,
+    category TEXT NOT NULL,
+    in_stock INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_products_category ON products (category, id);
+CREATE INDEX IF NOT EXISTS idx_products_price ON products (price);
+CREATE INDEX IF NOT EXISTS idx_products_category_price ON products (category, price);
+CREATE INDEX IF NOT EXISTS idx_products_stock_price ON products (in_stock, price);
+
+CREATE TABLE IF NOT EXISTS category_stats (
+    category TEXT PRIMARY KEY,
+    count INTEGER NOT NULL,
+    total REAL NOT NULL,
+    min_price REAL,
+    max_price REAL,
+    in_stock_count INTEGER NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS products_stats_insert AFTER INSERT ON products BEGIN
+    INSERT INTO category_stats (category, count, total, min_price, max_price, in_stock_count)
+    VALUES (NEW.category, 1, NEW.price, NEW.price, NEW.price, NEW.in_stock)
+    ON CONFLICT (category) DO UPDATE SET
+        count = count + 1,
+        total = total + excluded.total,
+        min_price = MIN(min_price, excluded.min_price),
+        max_price = MAX(max_price, excluded.max_price),
+        in_stock_count = in_stock_count + excluded.in_stock_count;
+END;
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('version', '0');
+-- Bumped when the whole catalog is replaced, so derived indexes start over.
+INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', '0');
+CREATE TRIGGER IF NOT EXISTS products_version_insert AFTER INSERT ON products BEGIN
+    UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'version';
+END;
+"""
+
+_COLUMNS = "id, name, price, category, in_stock"
+_INSERT = "INSERT INTO products (name, price, category, in_stock) VALUES (?, ?, ?, ?)"
+_INSERT_WITH_ID = "INSERT INTO products (id, name, price, category, in_stock) VALUES (?, ?, ?, ?, ?)"
+_STATS_COLUMNS = "count, total, min_price, max_price, in_stock_count"
+# Stays below SQLite's default limit on bound parameters per statement.
+_MAX_PARAMS = 500
+
+
+def load_json_products(file_path: str) -> Iterator[Product]:
+    """Stream the products of a JSON catalog file without reading it whole."""
+    with open(file_path, "rb") as f:
+        for item in jsoncodec.iter_objects(f):
+            yield Product(**item)
+
+
+def _row_to_dict(row: tuple) -> dict:
+    return {"id": row[0], "name": row[1], "price": row[2], "category": row[3], "in_stock": bool(row[4])}
+
+
+def _filters(
+    category: Optional[str],
+    in_stock: Optional[bool],
+    min_price: Optional[float],
+    max_price: Optional[float],
+) -> tuple[str, list]:
+    """WHERE clause and parameters for the common product filters."""
+    conditions: list[str] = []
+    params: list = []
+    if category is not None:
+        conditions.append("category = ?")
+        params.append(category)
+    if in_stock is not None:
+        conditions.append("in_stock = ?")
+        params.append(int(in_stock))
+    if min_price is not None:
+        conditions.append("price >= ?")
+        params.append(min_price)
+    if max_price is not None:
+        conditions.append("price <= ?")
+        params.append(max_price)
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    return where, params
+
+
+def _stats_to_dict(row: Optional[tuple]) -> dict:
+    count, total, min_price, max_price, in_stock = row or (0, 0.0, None, None, 0)
+    return {
+        "count": count,
+        "average_price": total / count if count else 0.0,
+        "min_price": min_price,
+        "max_price": max_price,
+        "in_stock_count": in_stock,
+    }
+
+
+class SQLiteProductStore:
+    """Product catalog stored in a SQLite database.
+
+    The database runs in WAL mode, so every MCP server process can read while
+    another one writes, and ids are allocated by SQLite inside the insert
+    transaction, so parallel ``add_product`` calls neither lose rows nor reuse
+    ids. Per-category aggregates are kept up to date by a trigger. All queries
+    use fixed SQL text with parameters, which ``sqlite3`` keeps prepared in its
+    statement cache.
+
+    On first start the database is filled from ``import_from`` (the legacy JSON
+    catalog) if it exists, or with the default products otherwise.
+    """
+
+    def __init__(self, db_path: str, import_from: Optional[str] = None) -> None:
+        self._db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._snapshots = SnapshotCache()
+        self._search = TrigramIndex()
+        self._search_state: tuple[Optional[str], Optional[str]] = (None, None)
+        self._search_last_id = 0
+        self._conn = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._initialize(import_from)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        # BEGIN IMMEDIATE takes the write lock up front, serializing writers
+        # across processes instead of failing on lock upgrade.
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _initialize(self, import_from: Optional[str]) -> None:
+        with self._transaction() as conn:
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'initialized'").fetchone():
+                return
+            if import_from and os.path.exists(import_from):
+                self._replace_all(conn, load_json_products(import_from))
+                count = conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+                logger.info("Imported %s products from %s", count, import_from)
+            else:
+                self._replace_all(conn, DEFAULT_PRODUCTS)
+            conn.execute("INSERT INTO meta (key, value) VALUES ('initialized', '1')")
+
+    @staticmethod
+    def _replace_all(conn: sqlite3.Connection, products: Iterable[Product]) -> None:
+        conn.execute("DELETE FROM products")
+        conn.execute("DELETE FROM category_stats")
+        conn.execute("DELETE FROM sqlite_sequence WHERE name = 'products'")
+        conn.executemany(
+            _INSERT_WITH_ID,
+            ((p.id, p.name, p.price, p.category, int(p.in_stock)) for p in products),
+        )
+
+    def list_products(
+        self,
+        category: Optional[str] = None,
+        in_stock: Optional[bool] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        after_id: Optional[int] = None,
+    ) -> list[dict]:
+        where, params = _filters(category, in_stock, min_price, max_price)
+        if after_id is not None:
+            # Keyset paging: seek in the primary key instead of stepping over OFFSET rows.
+            where = f"{where} AND id > ?" if where else " WHERE id > ?"
+            params.append(after_id)
+        params.extend([-1 if limit is None else max(0, limit), max(0, offset)])
+        query = f"SELECT {_COLUMNS} FROM products{where} ORDER BY id LIMIT ? OFFSET ?"
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [_row_to_dict(row) for row in rows]
+
+    def get_product(self, product_id: int) -> dict:
+        with self._lock:
+            row = self._conn.execute(f"SELECT {_COLUMNS} FROM products WHERE id = ?", (product_id,)).fetchone()
+        if row is None:
+            raise ValueError(f"Product with id={product_id} not found")
+        return _row_to_dict(row)
+
+    def get_products(self, product_ids: Iterable[int]) -> list[dict]:
+        """Return the products with the given IDs in request order, skipping unknown IDs."""
+        requested = list(product_ids)
+        found: dict[int, dict] = {}
+        with self._lock:
+            for start in range(0, len(requested), _MAX_PARAMS):
+                chunk = requested[start:start + _MAX_PARAMS]
+                query = f"SELECT {_COLUMNS} FROM products WHERE id IN ({','.join('?' * len(chunk))})"
+                for row in self._conn.execute(query, chunk):
+                    found[row[0]] = _row_to_dict(row)
+        return [found[product_id] for product_id in requested if product_id in found]
+
+    def _sync_search_index(self) -> None:
+        """Index rows added since the last search, or rebuild after a reseed."""
+        with self._lock:
+            state = tuple(
+                value for _, value in self._conn.execute(
+                    "SELECT key, value FROM meta WHERE key IN ('generation', 'version') ORDER BY key"
+                )
+            )
+            if state == self._search_state:
+                return
+            if state[0] != self._search_state[0]:
+                self._search = TrigramIndex()
+                self._search_last_id = 0
+            rows = self._conn.execute(
+                "SELECT id, name FROM products WHERE id > ? ORDER BY id", (self._search_last_id,)
+            ).fetchall()
+            self._search.add_many(rows)
+            if rows:
+                self._search_last_id = rows[-1][0]
+            self._search_state = state
+
+    def search_products(self, text: str, limit: int = 10) -> list[dict]:
+        """Return products whose names best match ``text``, tolerating typos."""
+        self._sync_search_index()
+        return self.get_products(self._search.search(text, limit))
+
+    def list_products_by_price(
+        self,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        category: Optional[str] = None,
+        in_stock: Optional[bool] = None,
+        order: str = "asc",
+        limit: Optional[int] = None,
+    ) -> list[dict]:
+        """Return products priced within a range, cheapest first or, with ``order="desc"``, dearest first.
+
+        Raises:
+            ValueError: If ``order`` is not ``"asc"`` or ``"desc"``.
+        """
+        direction = "DESC" if descending_order(order) else "ASC"
+        where, params = _filters(category, in_stock, min_price, max_price)
+        params.append(-1 if limit is None else max(0, limit))
+        # Rows come off a price index (ties in rowid order), so the scan stops after ``limit`` rows.
+        query = f"SELECT {_COLUMNS} FROM products{where} ORDER BY price {direction}, id {direction} LIMIT ?"
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [_row_to_dict(row) for row in rows]
+
+    def add_product(self, name: str, price: float, category: str, in_stock: bool = True) -> dict:
+        with self._transaction() as conn:
+            cursor = conn.execute(_INSERT, (name, price, category, int(in_stock)))
+            product_id = cursor.lastrowid
+        return {"id": product_id, "name": name, "price": price, "category": category, "in_stock": in_stock}
+
+    def add_products(self, items: Iterable[dict]) -> list[dict]:
+        """Insert many products in one transaction with consecutive ids.
+
+        Raises:
+            ValueError: If an item is invalid; nothing is inserted then.
+        """
+        fields = [validate_product_fields(index, item) for index, item in enumerate(items)]
+        if not fields:
+            return []
+        with self._transaction() as conn:
+            # The write lock is held, so no other process can take these ids.
+            row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'products'").fetchone()
+            first_id = (row[0] if row else 0) + 1
+            created = [{"id": first_id + offset, **item} for offset, item in enumerate(fields)]
+            conn.executemany(
+                _INSERT_WITH_ID,
+                ((p["id"], p["name"], p["price"], p["category"], int(p["in_stock"])) for p in created),
+            )
+        return created
+
+    def get_statistics(self, category: Optional[str] = None) -> dict:
+        with self._lock:
+            if category is not None:
+                row = self._conn.execute(
+                    f"SELECT {_STATS_COLUMNS} FROM category_stats WHERE category = ?", (category,)
+                ).fetchone()
+                stats = _stats_to_dict(row)
+                stats["category"] = category
+                return stats
+            rows = self._conn.execute(f"SELECT category, {_STATS_COLUMNS} FROM category_stats").fetchall()
+
+        categories = {row[0]: _stats_to_dict(row[1:]) for row in rows}
+        overall = _stats_to_dict((
+            sum(row[1] for row in rows),
+            sum(row[2] for row in rows),
+            min((row[3] for row in rows), default=None),
+            max((row[4] for row in rows), default=None),
+            sum(row[5] for row in rows),
+        ))
+        overall["categories"] = categories
+        return overall
+
+    def list_products_json(
+        self,
+        category: Optional[str] = None,
+        in_stock: Optional[bool] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        after_id: Optional[int] = None,
+    ) -> str:
+        return self._snapshots.get(
+            self.catalog_version(),
+            ("list", category, in_stock, offset, limit, after_id),
+            lambda: self.list_products(
+                category=category, in_stock=in_stock, offset=offset, limit=limit, after_id=after_id
+            ),
+        )
+
+    def get_product_json(self, product_id: int) -> str:
+        return self._snapshots.get(
+            self.catalog_version(), ("product", product_id), lambda: self.get_product(product_id)
+        )
+
+    def get_statistics_json(self, category: Optional[str] = None) -> str:
+        return self._snapshots.get(
+            self.catalog_version(), ("statistics", category), lambda: self.get_statistics(category=category)
+        )
+
+    def catalog_version(self) -> str:
+        """Return the catalog version counter, bumped by every insert."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return row[0]
+
+    def seed(self, items: Iterable[Product]) -> None:
+        with self._transaction() as conn:
+            self._replace_all(conn, items)
+            conn.execute(
+                "UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key IN ('version', 'generation')"
+            )
+
+    def import_json(self, file_path: str) -> int:
+        """Replace the catalog with the contents of a JSON catalog file."""
+        self.seed(load_json_products(file_path))
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+if __name__ == "__main__":
+    # One-shot import: python -m mcp_server.sqlite_store products.json products.db
+    if len(sys.argv) != 3:
+        sys.exit("usage: python -m mcp_server.sqlite_store <products.json> <products.db>")
+    imported = SQLiteProductStore(sys.argv[2]).import_json(sys.argv[1])
+    print(f"Imported {imported} products into {sys.argv[2]}")
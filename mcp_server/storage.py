@@ -1,82 +1,663 @@
 from __future__ import annotations
 
-import json
+import bisect
+import logging
 import os
+import sys
 import tempfile
-from dataclasses import asdict, dataclass
-from typing import Iterable, List
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from itertools import islice
+from operator import attrgetter
+from typing import Any, Callable, Hashable, Iterable, Iterator, Optional, Protocol
 
+from agent import jsoncodec
 
-@dataclass(frozen=True)
+from .price_index import PriceIndex, descending_order
+from .search import TrigramIndex
+
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows: the files are then single-process only
+    fcntl = None
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
 class Product:
+    """One catalog entry; slotted, since a catalog holds many of them."""
+
     id: int
     name: str
     price: float
     category: str
     in_stock: bool
 
+    def __post_init__(self) -> None:
+        # A few categories repeat across the whole catalog: share one string each.
+        # Anything else (a null from a hand-edited file) is left for validation.
+        if type(self.category) is str:
+            object.__setattr__(self, "category", sys.intern(self.category))
+
+    def to_dict(self) -> dict:
+        # Much cheaper than dataclasses.asdict, which deep-copies every field.
+        return {
+            "id": self.id,
+            "name": self.name,
+            "price": self.price,
+            "category": self.category,
+            "in_stock": self.in_stock,
+        }
+
+
+DEFAULT_PRODUCTS = (
+    Product(id=1, name="Ноутбук", price=50000, category="Электроника", in_stock=True),
+    Product(id=2, name="Смартфон", price=30000, category="Электроника", in_stock=True),
+    Product(id=3, name="Кофемашина", price=12000, category="Бытовая техника", in_stock=False),
+)
+
+
+class CatalogStore(Protocol):
+    """Interface the MCP server expects from a storage backend."""
+
+    def list_products(
+        self,
+        category: Optional[str] = None,
+        in_stock: Optional[bool] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        after_id: Optional[int] = None,
+    ) -> list[dict]: ...
+
+    def get_product(self, product_id: int) -> dict: ...
+
+    def get_products(self, product_ids: Iterable[int]) -> list[dict]: ...
+
+    def search_products(self, text: str, limit: int = 10) -> list[dict]: ...
+
+    def list_products_by_price(
+        self,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        category: Optional[str] = None,
+        in_stock: Optional[bool] = None,
+        order: str = "asc",
+        limit: Optional[int] = None,
+    ) -> list[dict]: ...
+
+    def add_product(self, name: str, price: float, category: str, in_stock: bool = True) -> dict: ...
+
+    def add_products(self, items: Iterable[dict]) -> list[dict]: ...
+
+    def get_statistics(self, category: Optional[str] = None) -> dict: ...
+
+    def list_products_json(
+        self,
+        category: Optional[str] = None,
+        in_stock: Optional[bool] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        after_id: Optional[int] = None,
+    ) -> str: ...
+
+    def get_product_json(self, product_id: int) -> str: ...
+
+    def get_statistics_json(self, category: Optional[str] = None) -> str: ...
+
+    def catalog_version(self) -> str: ...
+
+    def seed(self, items: Iterable[Product]) -> None: ...
+
+    def close(self) -> None: ...
+
+
+@dataclass
+class _Aggregate:
+    """Running price statistics over a set of products."""
+
+    count: int = 0
+    total: float = 0.0
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    in_stock: int = 0
+
+    def add(self, product: Product) -> None:
+        self.count += 1
+        self.total += product.price
+        if self.min_price is None or product.price < self.min_price:
+            self.min_price = product.price
+        if self.max_price is None or product.price > self.max_price:
+            self.max_price = product.price
+        if product.in_stock:
+            self.in_stock += 1
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "average_price": self.total / self.count if self.count else 0.0,
+            "min_price": self.min_price,
+            "max_price": self.max_price,
+            "in_stock_count": self.in_stock,
+        }
+
+
+@dataclass
+class _Statistics:
+    overall: _Aggregate = field(default_factory=_Aggregate)
+    categories: dict[str, _Aggregate] = field(default_factory=dict)
+
+    def add(self, product: Product) -> None:
+        self.overall.add(product)
+        self.categories.setdefault(product.category, _Aggregate()).add(product)
+
+
+def validate_product_fields(index: int, item: Any) -> dict:
+    """Check one item of a bulk insert and return its product fields (without id).
+
+    Raises:
+        ValueError: If a field is missing or has the wrong type or value.
+    """
+    if not isinstance(item, dict):
+        raise ValueError(f"Item {index}: expected an object")
+    name, price, category = item.get("name"), item.get("price"), item.get("category")
+    in_stock = item.get("in_stock", True)
+    if not isinstance(name, str) or not name.strip():
+        raise ValueError(f"Item {index}: name must be a non-empty string")
+    if isinstance(price, bool) or not isinstance(price, (int, float)) or price < 0:
+        raise ValueError(f"Item {index}: price must be a non-negative number")
+    if not isinstance(category, str) or not category.strip():
+        raise ValueError(f"Item {index}: category must be a non-empty string")
+    if not isinstance(in_stock, bool):
+        raise ValueError(f"Item {index}: in_stock must be a boolean")
+    return {"name": name, "price": price, "category": category, "in_stock": in_stock}
+
+
+class SnapshotCache:
+    """Pre-encoded JSON read results, valid for a single catalog version.
+
+    Results are encoded on first use and served as-is until the version
+    changes, at which point every entry is dropped and rebuilt lazily.
+    """
+
+    def __init__(self, max_entries: int = 1024) -> None:
+        self._max_entries = max(1, max_entries)
+        self._version: Hashable = None
+        self._entries: dict[Hashable, str] = {}
+
+    def get(self, version: Hashable, key: Hashable, build: Callable[[], Any]) -> str:
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+        text = self._entries.get(key)
+        if text is None:
+            text = jsoncodec.dumps(build())
+            if len(self._entries) >= self._max_entries:
+                del self._entries[next(iter(self._entries))]
+            self._entries[key] = text
+        return text
+
 
 class ProductStore:
-    def __init__(self, file_path: str) -> None:
+    """JSON-file product catalog.
+
+    By default every mutation rewrites the whole snapshot. In journaled mode
+    mutations are appended as JSON lines to ``<file>.log`` instead; the log is
+    replayed on load and folded back into the snapshot once it reaches
+    ``compact_threshold`` entries (or on an explicit ``compact()``).
+
+    Every snapshot write bumps a counter in ``<file>.version``; together with
+    the log offset it is the catalog version, and a changed counter tells the
+    other processes to reload even if the rewrite kept the file's mtime and size.
+
+    Several server processes may share the files. Reading happens under a
+    shared ``flock`` (on the log, or on ``<file>.lock`` without a journal);
+    assigning ids and writing, compacting and cutting off a torn log tail
+    happen under an exclusive one, after reloading what the other processes
+    wrote.
+    """
+
+    def __init__(
+        self,
+        file_path: str,
+        journal: bool = False,
+        fsync_every: int = 1,
+        compact_threshold: int = 1000,
+    ) -> None:
         self._file_path = file_path
+        self._journal = journal
+        self._log_path = f"{file_path}.log"
+        self._lock_path = self._log_path if journal else f"{file_path}.lock"
+        self._version_path = f"{file_path}.version"
+        self._fsync_every = max(0, fsync_every)
+        self._compact_threshold = max(0, compact_threshold)
+        self._log_file: Optional[Any] = None
+        self._lock_file: Optional[Any] = None
+        # None while the journal lock is not held, else whether it is exclusive.
+        self._lock_held: Optional[bool] = None
+        self._log_offset = 0
+        self._log_entries = 0
+        self._unsynced = 0
         self._products: list[Product] = []
+        self._by_id: dict[int, Product] = {}
+        self._by_category: dict[str, list[int]] = {}
+        # Whether catalog order is id order, so a paging cursor can be bisected.
+        self._ids_sorted = True
+        self._stats = _Statistics()
+        self._search = TrigramIndex()
+        self._price_index = PriceIndex()
         self._next_id = 1
-        self._load()
+        self._file_stamp: tuple[int, int] | None = None
+        self._generation = 0
+        self._snapshots = SnapshotCache()
+        with self._catalog_lock(exclusive=True):
+            self._load()
+
+    @staticmethod
+    def _stat(path: str) -> tuple[int, int] | None:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    @contextmanager
+    def _catalog_lock(self, exclusive: bool = False) -> Iterator[None]:
+        """Hold an ``flock`` on the lock file, unless this store already holds it."""
+        if fcntl is None or self._lock_held is not None:
+            yield
+            return
+        if self._lock_file is None:
+            os.makedirs(os.path.dirname(self._lock_path) or ".", exist_ok=True)
+            self._lock_file = open(self._lock_path, "ab")
+        fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        self._lock_held = exclusive
+        try:
+            yield
+        finally:
+            self._lock_held = None
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _refresh(self) -> None:
+        """Pick up changes written to the snapshot or the log by another process."""
+        with self._catalog_lock():
+            if self._read_generation() != self._generation or self._stat(self._file_path) != self._file_stamp:
+                self._load()
+                return
+            if self._journal:
+                log_stat = self._stat(self._log_path)
+                if log_stat is not None and log_stat[1] > self._log_offset:
+                    self._replay_log()
+
+    def _read_generation(self) -> int:
+        try:
+            with open(self._version_path, "rb") as f:
+                return int(f.read() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
 
     def _load(self) -> None:
         if not os.path.exists(self._file_path):
-            self._products = [
-                Product(id=1, name="Ноутбук", price=50000, category="Электроника", in_stock=True),
-                Product(id=2, name="Смартфон", price=30000, category="Электроника", in_stock=True),
-                Product(id=3, name="Кофемашина", price=12000, category="Бытовая техника", in_stock=False),
-            ]
-            self._next_id = 4
+            self._replace_all(DEFAULT_PRODUCTS)
             self._save()
             return
 
-        with open(self._file_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        with open(self._file_path, "rb") as f:
+            self._replace_all(Product(**item) for item in jsoncodec.iter_objects(f))
+        self._file_stamp = self._stat(self._file_path)
+        self._generation = self._read_generation()
+        self._close_log()
+        self._log_offset = 0
+        self._log_entries = 0
+        if self._journal:
+            self._replay_log()
+
+    def _replay_log(self) -> None:
+        try:
+            with open(self._log_path, "rb") as f:
+                f.seek(self._log_offset)
+                chunk = f.read()
+        except FileNotFoundError:
+            return
+
+        # A trailing line without a newline is a write torn by a crash: ignore it
+        # and cut it off so the next append starts on a clean line. Only the
+        # holder of the exclusive lock may cut it: under a shared lock no append
+        # is in progress, but truncating could race with the next writer.
+        complete = chunk.rfind(b"\n") + 1
+        for line in chunk[:complete].splitlines():
+            if not line.strip():
+                continue
+            try:
+                entry = jsoncodec.loads(line)
+            except ValueError:
+                logger.warning("Skipping corrupt journal entry in %s", self._log_path)
+                continue
+            self._apply(entry)
+            self._log_entries += 1
+        self._log_offset += complete
+        if complete < len(chunk) and self._lock_held is not False:
+            logger.warning("Truncating torn journal tail in %s", self._log_path)
+            self._close_log()
+            with open(self._log_path, "r+b") as f:
+                f.truncate(self._log_offset)
+
+    def _apply(self, entry: dict) -> None:
+        if entry.get("op") != "add":
+            logger.warning("Unknown journal operation: %s", entry.get("op"))
+            return
+        product = Product(**entry["product"])
+        # Entries may already be part of the snapshot if a compaction was
+        # interrupted before the log was truncated, so replay is idempotent.
+        if self._contains(product.id):
+            return
+        self._insert(product)
+        self._next_id = max(self._next_id, product.id + 1)
+
+    # In-memory representation. Alternative backends override these hooks and
+    # the query methods while reusing the snapshot/journal persistence.
+
+    def _replace_all(self, products: Iterable[Product]) -> None:
+        self._products = list(products)
+        self._next_id = max((p.id for p in self._products), default=0) + 1
+        self._reindex()
+
+    def _contains(self, product_id: int) -> bool:
+        return product_id in self._by_id
+
+    def _iter_products(self) -> Iterator[Product]:
+        return iter(self._products)
+
+    def _insert(self, product: Product) -> None:
+        if self._products and product.id <= self._products[-1].id:
+            self._ids_sorted = False
+        self._products.append(product)
+        self._by_id[product.id] = product
+        self._by_category.setdefault(product.category, []).append(product.id)
+        self._stats.add(product)
+        self._search.add(product.id, product.name)
+        self._price_index.add(product.id, product.price, product.category, product.in_stock)
 
-        self._products = [Product(**item) for item in data]
-        self._next_id = (max((p.id for p in self._products), default=0) + 1)
+    def _reindex(self) -> None:
+        self._ids_sorted = all(a.id < b.id for a, b in zip(self._products, self._products[1:]))
+        self._by_id = {}
+        self._by_category = {}
+        self._stats = _Statistics()
+        self._search = TrigramIndex()
+        self._price_index = PriceIndex()
+        for product in self._products:
+            self._by_id[product.id] = product
+            self._by_category.setdefault(product.category, []).append(product.id)
+            self._stats.add(product)
+            self._search.add(product.id, product.name)
+            self._price_index.add(product.id, product.price, product.category, product.in_stock)
 
     def _save(self) -> None:
         os.makedirs(os.path.dirname(self._file_path), exist_ok=True)
-        data = [asdict(p) for p in self._products]
+        data = [p.to_dict() for p in self._iter_products()]
         directory = os.path.dirname(self._file_path)
-        with tempfile.NamedTemporaryFile("w", delete=False, dir=directory, encoding="utf-8") as tmp:
-            json.dump(data, tmp, ensure_ascii=False, indent=2)
+        with tempfile.NamedTemporaryFile("wb", delete=False, dir=directory) as tmp:
+            tmp.write(jsoncodec.dump_bytes(data, indent=True))
+            tmp.flush()
+            os.fsync(tmp.fileno())
             tmp_path = tmp.name
+        # Bumped first: a reader that sees the new counter before the new file
+        # reloads once more when the file stamp changes.
+        generation = self._read_generation() + 1
+        with open(self._version_path, "w", encoding="ascii") as f:
+            f.write(str(generation))
         os.replace(tmp_path, self._file_path)
+        self._file_stamp = self._stat(self._file_path)
+        self._generation = generation
+        if self._journal:
+            self._truncate_log()
+
+    def _append(self, *entries: dict) -> None:
+        # Called under the exclusive journal lock right after a refresh, so the
+        # log ends at ``_log_offset`` and nobody else writes to it meanwhile.
+        if self._log_file is None:
+            self._log_file = open(self._log_path, "ab")
+        data = b"".join(jsoncodec.dump_bytes(entry) + b"\n" for entry in entries)
+        self._log_file.write(data)
+        self._log_file.flush()
+        self._log_offset += len(data)
+        self._log_entries += len(entries)
+        self._unsynced += len(entries)
+        if self._fsync_every and self._unsynced >= self._fsync_every:
+            self.sync()
+        if self._compact_threshold and self._log_entries >= self._compact_threshold:
+            self.compact()
+
+    def _truncate_log(self) -> None:
+        self._close_log()
+        if os.path.exists(self._log_path):
+            with open(self._log_path, "wb") as f:
+                os.fsync(f.fileno())
+        self._log_offset = 0
+        self._log_entries = 0
+        self._unsynced = 0
+
+    def _close_log(self) -> None:
+        if self._log_file is not None:
+            self.sync()
+            self._log_file.close()
+            self._log_file = None
+
+    def sync(self) -> None:
+        """Force journal entries written so far to disk."""
+        if self._log_file is not None and self._unsynced:
+            self._log_file.flush()
+            os.fsync(self._log_file.fileno())
+        self._unsynced = 0
+
+    def compact(self) -> None:
+        """Fold the journal into the snapshot file."""
+        with self._catalog_lock(exclusive=True):
+            # Entries appended by other processes since the last read would be lost otherwise.
+            self._refresh()
+            self._save()
+
+    def close(self) -> None:
+        self._close_log()
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
 
-    def list_products(self) -> list[dict]:
-        return [asdict(p) for p in self._products]
+    def list_products(
+        self,
+        category: Optional[str] = None,
+        in_stock: Optional[bool] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        after_id: Optional[int] = None,
+    ) -> list[dict]:
+        """Return products in catalog order, filtered and paged.
+
+        ``after_id`` (the id of the last product of the previous page) starts
+        the page right after that product, so walking a large catalog page by
+        page does not skip over the earlier pages again as ``offset`` does.
+        """
+        self._refresh()
+        offset = max(0, offset)
+        stop = None if limit is None else offset + max(0, limit)
+        if category is None:
+            rows: list = self._products
+            start = 0 if after_id is None else self._position_after(rows, after_id, attrgetter("id"))
+            resolve: Callable[[Any], Product] = lambda product: product
+        else:
+            rows = self._by_category.get(category, [])
+            start = 0 if after_id is None else self._position_after(rows, after_id)
+            resolve = self._by_id.__getitem__
+        if in_stock is None and min_price is None and max_price is None:
+            # Unfiltered pages are sliced directly instead of skipping ``offset`` rows.
+            end = None if stop is None else start + stop
+            return [resolve(row).to_dict() for row in rows[start + offset:end]]
+
+        products: Iterable[Product] = (resolve(rows[index]) for index in range(start, len(rows)))
+        if in_stock is not None:
+            products = (p for p in products if p.in_stock == in_stock)
+        if min_price is not None:
+            products = (p for p in products if p.price >= min_price)
+        if max_price is not None:
+            products = (p for p in products if p.price <= max_price)
+        return [p.to_dict() for p in islice(products, offset, stop)]
+
+    def _position_after(self, items: list, after_id: int, key: Optional[Callable[[Any], int]] = None) -> int:
+        """Index right after the product ``after_id`` in ``items`` (catalog order)."""
+        if self._ids_sorted:
+            return bisect.bisect_right(items, after_id, key=key)
+        ids = items if key is None else map(key, items)
+        for index, product_id in enumerate(ids):
+            if product_id == after_id:
+                return index + 1
+        return len(items)
 
     def get_product(self, product_id: int) -> dict:
-        for product in self._products:
-            if product.id == product_id:
-                return asdict(product)
-        raise ValueError(f"Product with id={product_id} not found")
+        self._refresh()
+        product = self._by_id.get(product_id)
+        if product is None:
+            raise ValueError(f"Product with id={product_id} not found")
+        return product.to_dict()
+
+    def get_products(self, product_ids: Iterable[int]) -> list[dict]:
+        """Return the products with the given IDs in request order, skipping unknown IDs."""
+        self._refresh()
+        by_id = self._by_id
+        return [by_id[product_id].to_dict() for product_id in product_ids if product_id in by_id]
+
+    def search_products(self, text: str, limit: int = 10) -> list[dict]:
+        """Return products whose names best match ``text``, tolerating typos.
+
+        Served from the trigram index maintained on every insert.
+        """
+        self._refresh()
+        return self.get_products(self._search.search(text, limit))
+
+    def list_products_by_price(
+        self,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        category: Optional[str] = None,
+        in_stock: Optional[bool] = None,
+        order: str = "asc",
+        limit: Optional[int] = None,
+    ) -> list[dict]:
+        """Return products priced within a range, cheapest first or, with ``order="desc"``, dearest first.
+
+        Served from the sorted price index, so a top-k query or a narrow range
+        costs a binary search plus the size of the result.
+
+        Raises:
+            ValueError: If ``order`` is not ``"asc"`` or ``"desc"``.
+        """
+        descending = descending_order(order)
+        self._refresh()
+        ids = self._price_index.select(min_price, max_price, category, in_stock, descending, limit)
+        return self.get_products(ids)
 
     def add_product(self, name: str, price: float, category: str, in_stock: bool = True) -> dict:
-        product = Product(
-            id=self._next_id,
-            name=name,
-            price=price,
-            category=category,
-            in_stock=in_stock,
+        with self._catalog_lock(exclusive=True):
+            self._refresh()
+            product = Product(
+                id=self._next_id,
+                name=name,
+                price=price,
+                category=category,
+                in_stock=in_stock,
+            )
+            self._next_id += 1
+            self._insert(product)
+            if self._journal:
+                self._append({"op": "add", "product": product.to_dict()})
+            else:
+                self._save()
+        return product.to_dict()
+
+    def add_products(self, items: Iterable[dict]) -> list[dict]:
+        """Add many products with consecutive ids and persist them once.
+
+        All items are validated before any is added, so a bad item leaves the
+        catalog unchanged. In journaled mode the batch is a single log write.
+
+        Raises:
+            ValueError: If an item is invalid.
+        """
+        fields = [validate_product_fields(index, item) for index, item in enumerate(items)]
+        if not fields:
+            return []
+        with self._catalog_lock(exclusive=True):
+            self._refresh()
+            products = [Product(id=self._next_id + offset, **item) for offset, item in enumerate(fields)]
+            self._next_id += len(products)
+            for product in products:
+                self._insert(product)
+            created = [product.to_dict() for product in products]
+            if self._journal:
+                self._append(*({"op": "add", "product": product} for product in created))
+            else:
+                self._save()
+        return created
+
+    def get_statistics(self, category: Optional[str] = None) -> dict:
+        """Return price statistics for the whole catalog or a single category.
+
+        Aggregates are maintained incrementally, so this never scans products.
+        The catalog-wide result also carries a per-category breakdown.
+        """
+        self._refresh()
+        if category is not None:
+            stats = self._stats.categories.get(category, _Aggregate()).as_dict()
+            stats["category"] = category
+            return stats
+        stats = self._stats.overall.as_dict()
+        stats["categories"] = {name: agg.as_dict() for name, agg in self._stats.categories.items()}
+        return stats
+
+    # Pre-encoded variants of the read queries for the MCP tools. Every
+    # mutation rewrites the snapshot or appends to the log, so the persisted
+    # state identifies the cached encodings.
+
+    def _snapshot(self, key: Hashable, build: Callable[[], Any]) -> str:
+        self._refresh()
+        return self._snapshots.get((self._generation, self._log_offset), key, build)
+
+    def list_products_json(
+        self,
+        category: Optional[str] = None,
+        in_stock: Optional[bool] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        after_id: Optional[int] = None,
+    ) -> str:
+        return self._snapshot(
+            ("list", category, in_stock, offset, limit, after_id),
+            lambda: self.list_products(
+                category=category, in_stock=in_stock, offset=offset, limit=limit, after_id=after_id
+            ),
         )
-        self._next_id += 1
-        self._products.append(product)
-        self._save()
-        return asdict(product)
 
-    def get_statistics(self) -> dict:
-        count = len(self._products)
-        avg = sum(p.price for p in self._products) / count if count else 0.0
-        return {"count": count, "average_price": avg}
+    def get_product_json(self, product_id: int) -> str:
+        return self._snapshot(("product", product_id), lambda: self.get_product(product_id))
+
+    def get_statistics_json(self, category: Optional[str] = None) -> str:
+        return self._snapshot(("statistics", category), lambda: self.get_statistics(category=category))
+
+    def catalog_version(self) -> str:
+        """Return a token that changes whenever the catalog is modified.
+
+        It is the snapshot write counter and the journal length, both kept in
+        the shared files, so every server process reports the same version.
+        """
+        self._refresh()
+        return f"{self._generation}.{self._log_offset}"
 
     def seed(self, items: Iterable[Product]) -> None:
-        self._products = list(items)
-        self._next_id = max((p.id for p in self._products), default=0) + 1
-        self._save()
+        with self._catalog_lock(exclusive=True):
+            self._replace_all(items)
+            self._save()
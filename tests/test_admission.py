@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from agent.admission import AdmissionController, Overloaded, request_deadline
+
+
+def test_admission_bounds_queue_and_rejects_fast():
+    admission = AdmissionController("test", max_concurrency=1, max_queue=1)
+    release = asyncio.Event()
+
+    async def hold():
+        async with admission.admit():
+            await release.wait()
+
+    async def scenario():
+        holder = asyncio.create_task(hold())
+        queued = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        assert (admission.active, admission.waiting) == (1, 1)
+
+        with pytest.raises(Overloaded) as full:
+            async with admission.admit():
+                pass
+        release.set()
+        await asyncio.gather(holder, queued)
+        return full.value
+
+    rejected = asyncio.run(scenario())
+    assert rejected.status_code == 429
+    assert rejected.retry_after >= 1
+    assert admission.stats()["rejected"] == 1
+
+
+def test_admission_rejects_when_deadline_passes_in_queue():
+    admission = AdmissionController("test", max_concurrency=1, max_queue=8)
+
+    async def scenario():
+        async with admission.admit():
+            with request_deadline(0.01), pytest.raises(Overloaded) as late:
+                async with admission.admit():
+                    pass
+        return late.value
+
+    assert asyncio.run(scenario()).status_code == 503
+    assert (admission.active, admission.waiting) == (0, 0)
@@ -1,12 +1,21 @@
 from __future__ import annotations
 
+import json
+
 from fastapi.testclient import TestClient
 
 from api import main
 
 
 class FakeAgent:
+    def __init__(self) -> None:
+        self.runs = 0
+
+    async def etag(self, query: str):
+        return '"v1"' if query == "test" else None
+
     async def run(self, query: str) -> dict:
+        self.runs += 1
         return {"response": "ok", "tools_used": []}
 
 
@@ -16,3 +25,120 @@ def test_api_query(monkeypatch):
     response = client.post("/api/v1/agent/query", json={"query": "test"})
     assert response.status_code == 200
     assert response.json()["response"] == "ok"
+
+
+def test_api_query_etag(monkeypatch):
+    agent = FakeAgent()
+    monkeypatch.setattr(main, "get_agent", lambda: agent)
+    client = TestClient(main.app)
+    first = client.post("/api/v1/agent/query", json={"query": "test"})
+    etag = first.headers["ETag"]
+    second = client.post("/api/v1/agent/query", json={"query": "test"}, headers={"If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.headers["ETag"] == etag
+    assert agent.runs == 1
+
+    # Writes get no ETag and always run.
+    write = client.post("/api/v1/agent/query", json={"query": "write"}, headers={"If-None-Match": "*"})
+    assert write.status_code == 200
+    assert "ETag" not in write.headers
+    assert agent.runs == 2
+
+
+def test_api_query_batch(monkeypatch):
+    class FakeBatchAgent(FakeAgent):
+        async def run_batch(self, queries: list[str]) -> list[dict]:
+            return [{"response": query, "tools_used": []} for query in queries]
+
+    monkeypatch.setattr(main, "get_agent", lambda: FakeBatchAgent())
+    client = TestClient(main.app)
+    response = client.post("/api/v1/agent/query:batch", json={"queries": ["a", "b"]})
+    assert response.status_code == 200
+    assert [item["response"] for item in response.json()["results"]] == ["a", "b"]
+
+
+def test_api_query_stream_ndjson(monkeypatch):
+    class FakeStreamingAgent(FakeAgent):
+        async def stream(self, query: str):
+            yield {"type": "line", "text": "first"}
+            yield {"type": "done", "tools_used": []}
+
+    monkeypatch.setattr(main, "get_agent", lambda: FakeStreamingAgent())
+    client = TestClient(main.app)
+    response = client.post(
+        "/api/v1/agent/query", json={"query": "test"}, headers={"Accept": "application/x-ndjson"}
+    )
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line)["type"] for line in response.text.splitlines()] == ["line", "done"]
+
+
+def test_api_metrics_and_timings(monkeypatch):
+    class FakeTimedAgent(FakeAgent):
+        async def run(self, query: str) -> dict:
+            main.REGISTRY.observe("test_duration_seconds", 0.002, step="fake")
+            return await super().run(query)
+
+        async def server_metrics(self) -> list[dict]:
+            return []
+
+    monkeypatch.setattr(main, "get_agent", lambda: FakeTimedAgent())
+    client = TestClient(main.app)
+    response = client.post("/api/v1/agent/query?timings=true", json={"query": "test"})
+    assert response.json()["timings"] == [{"metric": "test_duration_seconds", "step": "fake", "seconds": 0.002}]
+    metrics = client.get("/metrics").text
+    assert 'test_duration_seconds_bucket{step="fake",le="0.0025"} 1' in metrics
+
+
+def test_api_rejects_overloaded_queries(monkeypatch):
+    class FakeOverloadedAgent(FakeAgent):
+        async def run(self, query: str) -> dict:
+            raise main.Overloaded("graph: too many requests waiting", 429, 3)
+
+    monkeypatch.setattr(main, "get_agent", lambda: FakeOverloadedAgent())
+    client = TestClient(main.app)
+    response = client.post("/api/v1/agent/query", json={"query": "test"})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "3"
+
+
+def test_api_imports_ndjson_products(monkeypatch):
+    class FakeImportingAgent(FakeAgent):
+        async def import_products(self, items) -> dict:
+            return {"added": len([item async for item in items]), "chunks": 1}
+
+    monkeypatch.setattr(main, "get_agent", lambda: FakeImportingAgent())
+    client = TestClient(main.app)
+    body = "\n".join(json.dumps({"name": f"P{i}", "price": i, "category": "C"}) for i in range(3))
+    response = client.post(
+        "/api/v1/products:import", content=body, headers={"Content-Type": "application/x-ndjson"}
+    )
+    assert response.json() == {"added": 3, "chunks": 1}
+    bad = client.post("/api/v1/products:import", content="{", headers={"Content-Type": "application/x-ndjson"})
+    assert bad.status_code == 400
+
+
+def test_api_health_and_readiness(monkeypatch):
+    class FakeStartingAgent(FakeAgent):
+        prewarmed = closed = False
+
+        async def prewarm(self) -> None:
+            self.prewarmed = True
+
+        async def aclose(self) -> None:
+            self.closed = True
+
+    agent = FakeStartingAgent()
+
+    async def start_agent():
+        return agent
+
+    monkeypatch.setattr(main, "start_agent", start_agent)
+    assert TestClient(main.app).get("/readyz").status_code == 503
+    with TestClient(main.app) as client:
+        assert client.get("/healthz").json() == {"status": "ok"}
+        ready = client.get("/readyz")
+        assert ready.status_code == 200
+        assert "startup" in ready.json()["startup_seconds"]
+        assert agent.prewarmed
+    assert agent.closed
+    assert client.get("/readyz").status_code == 503
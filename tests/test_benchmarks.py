@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+from agent import jsoncodec
+from benchmarks.catalog import measure_load
+from benchmarks.common import compare, latency_summary, synthetic_products
+
+
+def test_synthetic_products_are_reproducible():
+    first = list(synthetic_products(50, seed=1))
+    assert [product.id for product in first] == list(range(1, 51))
+    assert first == list(synthetic_products(50, seed=1))
+    assert all(100 <= product.price <= 200000 for product in first)
+
+
+def test_compare_flags_slower_and_lower_throughput_only():
+    baseline = {
+        "config": {"requests": 100},
+        "overall": {"count": 100, "p99_ms": 10.0, "requests_per_second": 100.0},
+        "stores": {"json": {"get_product_us": 5.0}},
+    }
+    current = {
+        "config": {"requests": 500},
+        "overall": {"count": 500, "p99_ms": 20.0, "requests_per_second": 50.0},
+        "stores": {"json": {"get_product_us": 4.0}, "sqlite": {"get_product_us": 9.0}},
+    }
+    regressions = compare(current, baseline, tolerance=0.25)
+    assert [line.split(":")[0] for line in regressions] == ["overall.p99_ms", "overall.requests_per_second"]
+    assert latency_summary([0.001, 0.002])["p50_ms"] == 2.0
+
+
+def test_measure_load_reports_time_and_memory(tmp_path):
+    path = tmp_path / "products.json"
+    path.write_bytes(jsoncodec.dump_bytes([product.to_dict() for product in synthetic_products(20)]))
+    result = measure_load("json", str(path))
+    assert result["count"] == 20
+    assert {"load_seconds", "load_peak_mb", "retained_mb"} <= result.keys()
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import asyncio
+
+from agent.cache import ResponseCache
+from agent.graph import build_agent
+from agent.startup import STARTUP
+
+
+class FakeMCPClient:
+    def __init__(self) -> None:
+        self.version = "1"
+        self.calls: list[str] = []
+        self.last_arguments: dict[str, dict] = {}
+
+    async def call_tool(self, name: str, arguments: dict) -> object:
+        self.calls.append(name)
+        self.last_arguments[name] = arguments
+        if name == "get_catalog_version":
+            return {"version": self.version}
+        if name == "get_statistics":
+            return {"count": 2, "average_price": 200}
+        if name == "list_products":
+            products = [
+                {"id": i, "name": f"P{i}", "price": 10 * i, "category": "C", "in_stock": True}
+                for i in range(1, 6)
+            ]
+            products = [p for p in products if p["id"] > arguments.get("after_id", 0)]
+            return products[:arguments.get("limit", len(products))]
+        if name == "get_product":
+            if arguments["product_id"] != 1:
+                raise ValueError("not found")
+            return {"id": 1, "name": "A", "price": 100, "category": "C", "in_stock": True}
+        raise AssertionError(f"unexpected tool {name}")
+
+
+def test_agent_caches_reads_until_catalog_version_changes():
+    mcp_client = FakeMCPClient()
+    cache = ResponseCache(max_size=8, ttl=60)
+    agent = build_agent(mcp_client=mcp_client, cache=cache)
+
+    async def scenario():
+        first = await agent.run("Какая средняя цена продуктов?")
+        second = await agent.run("какая СРЕДНЯЯ цена продуктов")
+        mcp_client.version = "2"
+        third = await agent.run("Какая средняя цена продуктов?")
+        return first, second, third
+
+    first, second, third = asyncio.run(scenario())
+    assert first == second == third
+    assert mcp_client.calls.count("get_statistics") == 2
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_agent_etag_follows_catalog_version_and_skips_writes():
+    mcp_client = FakeMCPClient()
+    agent = build_agent(mcp_client=mcp_client)
+
+    async def scenario():
+        first = await agent.etag("Какая средняя цена продуктов?")
+        again = await agent.etag("какая СРЕДНЯЯ цена продуктов")
+        mcp_client.version = "2"
+        changed = await agent.etag("Какая средняя цена продуктов?")
+        write = await agent.etag("Добавь продукт: Мышка, цена 1500, категория C")
+        discount = await agent.etag("Скидка 10% на товар id 1")
+        return first, again, changed, write, discount
+
+    first, again, changed, write, discount = asyncio.run(scenario())
+    assert first == again != changed
+    assert (write, discount) == (None, None)
+    assert "get_statistics" not in mcp_client.calls
+
+
+def test_agent_batch_deduplicates_tool_calls_and_keeps_order():
+    mcp_client = FakeMCPClient()
+    agent = build_agent(mcp_client=mcp_client, cache=ResponseCache(max_size=0))
+    queries = ["Какая средняя цена продуктов?", "товар id 1", "id 2", "id 1"]
+
+    results = asyncio.run(agent.run_batch(queries, concurrency=4))
+
+    assert results[0]["response"].startswith("Всего продуктов: 2")
+    assert results[1] == results[3]
+    assert results[1]["response"].startswith("ID 1: A")
+    assert results[2]["response"] == "not found"
+    assert mcp_client.calls.count("get_product") == 2
+    assert mcp_client.calls.count("get_catalog_version") == 1
+
+
+
+def test_agent_passes_stock_filter_to_listings():
+    mcp_client = FakeMCPClient()
+    agent = build_agent(mcp_client=mcp_client, cache=ResponseCache(max_size=0))
+
+    async def scenario():
+        await agent.run("Покажи продукты категории C в наличии")
+        listed = mcp_client.last_arguments["list_products"]
+        streamed = [event async for event in agent.stream("Покажи продукты нет в наличии")]
+        return listed, streamed, mcp_client.last_arguments["list_products"]
+
+    listed, streamed, paged = asyncio.run(scenario())
+    assert listed == {"category": "C", "in_stock": True}
+    assert streamed[-1]["type"] == "done"
+    assert (paged["in_stock"], "category" in paged) == (False, False)
+
+def test_agent_streams_product_listing_in_pages():
+    mcp_client = FakeMCPClient()
+    agent = build_agent(mcp_client=mcp_client)
+    agent._page_size = 2
+
+    async def collect(query):
+        return [event async for event in agent.stream(query)]
+
+    events = asyncio.run(collect("Покажи все продукты"))
+    assert [event["text"] for event in events[:-1]] == [f"ID {i}: P{i} | C | {10 * i} | в наличии" for i in range(1, 6)]
+    assert events[-1] == {"type": "done", "tools_used": ["list_products"]}
+    assert mcp_client.calls.count("list_products") == 3
+
+
+def test_agent_imports_products_in_chunks():
+    class ImportingClient(FakeMCPClient):
+        def __init__(self) -> None:
+            super().__init__()
+            self.chunks: list[int] = []
+
+        async def call_tool(self, name: str, arguments: dict) -> object:
+            if name != "add_products":
+                return await super().call_tool(name, arguments)
+            self.chunks.append(len(arguments["items"]))
+            return {"added": len(arguments["items"])}
+
+    mcp_client = ImportingClient()
+    agent = build_agent(mcp_client=mcp_client)
+
+    async def items():
+        for i in range(7):
+            yield {"name": f"P{i}", "price": i, "category": "C"}
+
+    result = asyncio.run(agent.import_products(items(), chunk_size=3))
+    assert result == {"added": 7, "chunks": 3}
+    assert mcp_client.chunks == [3, 3, 1]
+
+
+def test_agent_discounts_many_products_at_once():
+    class BulkClient(FakeMCPClient):
+        async def call_tool(self, name: str, arguments: dict) -> object:
+            if name != "get_products":
+                return await super().call_tool(name, arguments)
+            self.calls.append(name)
+            return [
+                {"id": i, "name": f"P{i}", "price": 100 * i, "category": "C", "in_stock": True}
+                for i in arguments["product_ids"]
+                if i < 5
+            ]
+
+    mcp_client = BulkClient()
+    agent = build_agent(mcp_client=mcp_client, cache=ResponseCache(max_size=0))
+
+    by_ids = asyncio.run(agent.run("скидка 10% на ID 1, 2, 5"))
+    assert by_ids["tools_used"] == ["get_products", "calculator"]
+    assert by_ids["response"].splitlines() == [
+        "Цены после скидки 10.0%:",
+        "P1 (ID 1): 100.00 RUB → 90.00 RUB",
+        "P2 (ID 2): 200.00 RUB → 180.00 RUB",
+        "Не найдены товары с ID: 5",
+    ]
+
+    by_category = asyncio.run(agent.run("скидка 50% на все товары категории C"))
+    assert by_category["tools_used"] == ["list_products", "calculator"]
+    assert by_category["response"].splitlines()[1] == "P1 (ID 1): 10.00 RUB → 5.00 RUB"
+
+
+def test_agent_prewarm_runs_every_read_action_but_no_writes():
+    mcp_client = FakeMCPClient()
+    agent = build_agent(mcp_client=mcp_client, cache=ResponseCache(max_size=0))
+
+    asyncio.run(agent.prewarm())
+
+    assert {"get_product", "get_statistics", "list_products"} <= set(mcp_client.calls)
+    assert "add_product" not in mcp_client.calls
+    assert "prewarm add_product" in STARTUP.phases()
@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+import asyncio
+import json
+
+import pytest
+
+from agent.admission import DeadlineExceeded, Overloaded, remaining_time, request_deadline
+from agent.mcp_client import MCP_CALLS_METRIC, MCP_PHASE_METRIC, MCPClient
+from agent.metrics import REGISTRY, collect_timings
+
+
+def _client(tmp_path, **kwargs) -> MCPClient:
+    file_path = tmp_path / "products.json"
+    file_path.write_text(json.dumps([
+        {"id": 1, "name": "A", "price": 100, "category": "C", "in_stock": True},
+    ]), encoding="utf-8")
+    return MCPClient(env={"PRODUCTS_PATH": str(file_path)}, **kwargs)
+
+
+def test_pool_reuses_and_restarts_sessions(tmp_path):
+    client = _client(tmp_path, pool_size=1)
+
+    async def scenario():
+        try:
+            first = await client.call_tool("get_product", {"product_id": 1})
+            pooled = client._sessions[0]
+            session = pooled.session
+            stats = await client.call_tool("get_statistics", {})
+            assert pooled.session is session
+
+            await pooled.stop()
+            again = await client.call_tool("get_product", {"product_id": 1})
+            assert pooled.alive and pooled.session is not session
+            return first, stats, again
+        finally:
+            await client.aclose()
+
+    first, stats, again = asyncio.run(scenario())
+    assert first["name"] == "A"
+    assert stats["count"] == 1
+    assert again == first
+    assert client._sessions == []
+
+
+def test_call_tool_on_all_leaves_the_pool_to_other_calls(tmp_path):
+    client = _client(tmp_path, pool_size=2)
+
+    async def scenario():
+        try:
+            await client.start()
+            async with client._lease():
+                stats = await asyncio.wait_for(client.call_tool_on_all("get_statistics", {}), 10)
+                interrupted = asyncio.ensure_future(client.call_tool_on_all("get_statistics", {}))
+                await asyncio.sleep(0)
+                interrupted.cancel()
+                await asyncio.gather(interrupted, return_exceptions=True)
+            return stats, client._idle.qsize(), client.admission.active
+        finally:
+            await client.aclose()
+
+    stats, idle, admission = asyncio.run(scenario())
+    assert [item["count"] for item in stats] == [1, 1]
+    assert idle == 2
+    assert admission == 0
+
+
+
+def test_failed_tool_calls_are_counted_as_tool_errors(tmp_path):
+    client = _client(tmp_path, pool_size=1)
+
+    def count(status):
+        return sum(
+            item["value"] for item in REGISTRY.snapshot()["counters"]
+            if item["name"] == MCP_CALLS_METRIC and item["labels"] == {"tool": "get_product", "status": status}
+        )
+
+    async def scenario():
+        try:
+            await client.call_tool("get_product", {"product_id": 1})
+            return await client.call_tool("get_product", {"product_id": 99})
+        finally:
+            await client.aclose()
+
+    ok, failed = count("ok"), count("tool_error")
+    result = asyncio.run(scenario())
+    assert "99" in str(result)
+    assert (count("ok") - ok, count("tool_error") - failed) == (1, 1)
+
+def test_pinned_calls_go_through_one_session(tmp_path):
+    client = _client(tmp_path, pool_size=2)
+
+    async def scenario():
+        try:
+            await client.start()
+            used = []
+            for pooled in client._sessions:
+                async def recording(name, arguments, session=pooled.session, real=pooled.session.call_tool):
+                    used.append(session)
+                    return await real(name, arguments)
+
+                pooled.session.call_tool = recording
+            async with client.pinned() as calls:
+                created = [
+                    await calls.call_tool("add_product", {"name": f"P{i}", "price": 1, "category": "C"})
+                    for i in range(3)
+                ]
+                idle = client._idle.qsize()
+            return used, created, idle, client._idle.qsize()
+        finally:
+            await client.aclose()
+
+    used, created, idle, released = asyncio.run(scenario())
+    assert len(used) == 3 and len(set(map(id, used))) == 1
+    assert [item["id"] for item in created] == [2, 3, 4]
+    assert (idle, released) == (1, 2)
+
+
+def test_in_process_transport_calls_the_mounted_server(tmp_path, monkeypatch):
+    file_path = tmp_path / "products.json"
+    monkeypatch.setenv("PRODUCTS_PATH", str(file_path))
+    from mcp_server import server
+    from mcp_server.storage import Product, ProductStore
+
+    store = ProductStore(str(file_path))
+    store.seed([Product(id=1, name="A", price=100, category="C", in_stock=True)])
+    monkeypatch.setattr(server, "store", store)
+    client = MCPClient(transport="inprocess", pool_size=2)
+
+    async def scenario():
+        try:
+            products = await asyncio.gather(*(client.call_tool("get_product", {"product_id": 1}) for _ in range(4)))
+            created = await client.call_tool("add_product", {"name": "B", "price": 50, "category": "C"})
+            stats = await client.call_tool("get_statistics", {})
+            return products, created, stats
+        finally:
+            await client.aclose()
+
+    products, created, stats = asyncio.run(scenario())
+    assert client.in_process
+    assert all(product["name"] == "A" for product in products)
+    assert created["id"] == 2
+    assert stats["count"] == 2
+
+
+def test_concurrent_identical_reads_are_coalesced():
+    class SlowClient(MCPClient):
+        def __init__(self) -> None:
+            super().__init__(coalesce=True)
+            self.calls: list[str] = []
+
+        async def _call_tool(self, name, arguments):
+            self.calls.append(name)
+            await asyncio.sleep(0.01)
+            return {"name": name, **arguments}
+
+    client = SlowClient()
+
+    async def scenario():
+        return await asyncio.gather(
+            *(client.call_tool("get_statistics", {}) for _ in range(5)),
+            client.call_tool("get_statistics", {"category": "C"}),
+            *(client.call_tool("add_product", {"name": "A"}) for _ in range(2)),
+        )
+
+    results = asyncio.run(scenario())
+    assert results[:5] == [{"name": "get_statistics"}] * 5
+    assert results[5] == {"name": "get_statistics", "category": "C"}
+    assert client.calls.count("get_statistics") == 2
+    assert client.calls.count("add_product") == 2
+    assert client.coalesced == 4
+    assert client._inflight == {}
+
+
+def test_coalesced_call_is_not_bound_to_the_first_callers_deadline():
+    class SlowClient(MCPClient):
+        def __init__(self) -> None:
+            super().__init__(coalesce=True)
+            self.deadlines: list = []
+
+        async def _call_tool(self, name, arguments):
+            self.deadlines.append(remaining_time())
+            await asyncio.sleep(0.05)
+            return {"name": name}
+
+    client = SlowClient()
+
+    async def impatient():
+        with request_deadline(0.01):
+            return await client.call_tool("get_statistics", {})
+
+    async def scenario():
+        first = asyncio.ensure_future(impatient())
+        await asyncio.sleep(0)
+        second = await client.call_tool("get_statistics", {})
+        return await asyncio.gather(first, return_exceptions=True), second
+
+    (first,), second = asyncio.run(scenario())
+    assert isinstance(first, DeadlineExceeded)
+    assert second == {"name": "get_statistics"}
+    assert client.deadlines == [None]
+    assert client.coalesced == 1
+
+
+
+def test_coalesced_call_records_its_phases_in_the_callers_timings(tmp_path):
+    client = _client(tmp_path, pool_size=1)
+
+    async def scenario():
+        try:
+            with collect_timings() as timings, request_deadline(10):
+                await client.call_tool("get_statistics", {})
+            return timings
+        finally:
+            await client.aclose()
+
+    timings = asyncio.run(scenario())
+    phases = {item["phase"] for item in timings if item["metric"] == MCP_PHASE_METRIC and "tool" in item}
+    assert {"lease", "call", "decode"} <= phases
+
+def test_tool_timeout_restarts_the_session(tmp_path):
+    client = _client(tmp_path, pool_size=1, coalesce=False, tool_timeouts={"get_product": 0.001})
+
+    async def scenario():
+        try:
+            await client.call_tool("get_statistics", {})
+            session = client._sessions[0].session
+            try:
+                await client.call_tool("get_product", {"product_id": 1})
+            except TimeoutError as exc:
+                timed_out = exc
+            else:
+                timed_out = None
+            restarted = client._sessions[0].session is not session
+            stats = await client.call_tool("get_statistics", {})
+            return timed_out, restarted, stats
+        finally:
+            await client.aclose()
+
+    timed_out, restarted, stats = asyncio.run(scenario())
+    assert "get_product" in str(timed_out)
+    assert restarted
+    assert stats["count"] == 1
+
+
+def test_request_deadline_does_not_restart_the_session(tmp_path):
+    client = _client(tmp_path, pool_size=1, coalesce=False)
+
+    async def slow_call(name, arguments):
+        await asyncio.sleep(1)
+
+    async def scenario():
+        try:
+            await client.call_tool("get_statistics", {})
+            session = client._sessions[0].session
+            session.call_tool, real_call = slow_call, session.call_tool
+            with request_deadline(0.05), pytest.raises(DeadlineExceeded):
+                await client.call_tool("get_product", {"product_id": 1})
+            # An expired deadline fails before a call is sent.
+            with request_deadline(0), pytest.raises(Overloaded):
+                await client.call_tool("get_product", {"product_id": 1})
+            session.call_tool = real_call
+            kept = client._sessions[0].session is session
+            return kept, await client.call_tool("get_product", {"product_id": 1})
+        finally:
+            await client.aclose()
+
+    kept, product = asyncio.run(scenario())
+    assert kept
+    assert product["id"] == 1
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+from agent.parser import parse_query
+
+
+def test_parser_picks_intent_by_priority():
+    assert parse_query("Какая средняя цена продуктов?") == {"action": "get_statistics", "category": None}
+    assert parse_query("Добавь продукт: Мышка, цена 1500, категория Электроника")["action"] == "add_product"
+    assert parse_query("Покажи продукты категории Электроника.") == {
+        "action": "list_products",
+        "category": "Электроника",
+    }
+    assert parse_query("товар id 3") == {"action": "get_product", "product_id": 3}
+    assert parse_query("привет") == {"action": "unknown"}
+
+
+def test_parser_cache_hands_out_copies():
+    first = parse_query("скидка 10% на ID 1, 2, 5")
+    first["product_ids"].append(7)
+    again = parse_query("  скидка 10%  на ID 1, 2, 5 ")
+    assert again == {"action": "discount", "percent": 10.0, "product_ids": [1, 2, 5]}
+
+
+def test_parser_routes_search_queries():
+    assert parse_query("Найди товар ноутбук?") == {"action": "search_products", "text": "ноутбук", "limit": 10}
+    assert parse_query("найди")["action"] == "list_products"
+    assert parse_query("Найди товар id 5") == {"action": "get_product", "product_id": 5}
+    cheap = parse_query("Найди товары дешевле 20000")
+    assert (cheap["action"], cheap["max_price"]) == ("list_products_by_price", 20000.0)
+    assert parse_query("Найди дешевый ноутбук")["action"] == "search_products"
+
+
+def test_parser_routes_price_queries():
+    assert parse_query("Покажи товары дешевле 20000") == {
+        "action": "list_products_by_price",
+        "min_price": None,
+        "max_price": 20000.0,
+        "category": None,
+        "in_stock": None,
+        "order": "asc",
+        "limit": None,
+    }
+    top = parse_query("5 самых дорогих товаров категории Электроника, в наличии")
+    assert (top["order"], top["limit"], top["category"], top["in_stock"]) == ("desc", 5, "Электроника", True)
+    assert parse_query("самый дешевый товар")["limit"] == 1
+    assert parse_query("цена от 100 до 500")["min_price"] == 100.0
+    assert parse_query("дорогие товары") == {"action": "list_products", "category": None}
+
+
+def test_parser_price_conditions_end_the_category():
+    query = parse_query("Покажи продукты категории Электроника дешевле 20000")
+    assert (query["action"], query["category"], query["max_price"]) == ("list_products_by_price", "Электроника", 20000.0)
+    assert parse_query("товары категории Бытовая техника от 100 до 500")["category"] == "Бытовая техника"
+    ranged = parse_query("товары от 100 до 500")
+    assert (ranged["action"], ranged["min_price"], ranged["max_price"]) == ("list_products_by_price", 100.0, 500.0)
+    under = parse_query("list products under 500")
+    assert (under["action"], under["max_price"]) == ("list_products_by_price", 500.0)
+
+
+def test_parser_keeps_new_category_names_and_stock_filters():
+    added = parse_query("Добавь продукт: Чехол, цена 100, категория Защита от воды")
+    assert added["category"] == "Защита от воды"
+    assert parse_query("Добавь продукт: Зонт, категория Всё до 500")["category"] == "Всё до 500"
+    assert parse_query("Покажи продукты категории Электроника в наличии") == {
+        "action": "list_products",
+        "category": "Электроника",
+        "in_stock": True,
+    }
+    assert parse_query("Найди самсунг дорогой") == {"action": "search_products", "text": "самсунг дорогой", "limit": 10}
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import json
+
+from mcp_server.sqlite_store import SQLiteProductStore
+from mcp_server.storage import Product
+
+
+def test_sqlite_store_imports_json_once(tmp_path):
+    json_path = tmp_path / "products.json"
+    json_path.write_text(json.dumps([
+        {"id": 5, "name": "A", "price": 100, "category": "C", "in_stock": True},
+    ]), encoding="utf-8")
+    db_path = str(tmp_path / "products.db")
+    store = SQLiteProductStore(db_path, import_from=str(json_path))
+    assert store.get_product(5)["name"] == "A"
+    assert store.add_product(name="B", price=300, category="C", in_stock=False)["id"] == 6
+    store.close()
+
+    reopened = SQLiteProductStore(db_path, import_from=str(json_path))
+    assert [p["id"] for p in reopened.list_products()] == [5, 6]
+
+
+def test_sqlite_store_concurrent_writers_share_ids(tmp_path):
+    db_path = str(tmp_path / "products.db")
+    first = SQLiteProductStore(db_path)
+    second = SQLiteProductStore(db_path)
+    first.seed([Product(id=1, name="A", price=100, category="C", in_stock=True)])
+    ids = [
+        first.add_product(name="B", price=300, category="C")["id"],
+        second.add_product(name="E", price=200, category="D", in_stock=False)["id"],
+    ]
+    assert ids == [2, 3]
+    assert [p["id"] for p in first.list_products(category="C", in_stock=True)] == [1, 2]
+    stats = second.get_statistics(category="C")
+    assert (stats["count"], stats["average_price"], stats["max_price"]) == (2, 200, 300)
+    overall = first.get_statistics()
+    assert (overall["count"], overall["in_stock_count"]) == (3, 2)
+    assert overall["categories"]["D"]["min_price"] == 200
+
+
+def test_sqlite_store_json_snapshots_follow_the_version(tmp_path):
+    store = SQLiteProductStore(str(tmp_path / "products.db"))
+    listing = store.list_products_json()
+    assert store.list_products_json() is listing
+    assert len(json.loads(listing)) == 3
+
+    store.add_product(name="Мышка", price=1500, category="Электроника")
+    assert json.loads(store.list_products_json())[-1]["name"] == "Мышка"
+    assert json.loads(store.get_statistics_json("Электроника"))["count"] == 3
+
+
+def test_sqlite_store_add_products_in_one_transaction(tmp_path):
+    store = SQLiteProductStore(str(tmp_path / "products.db"))
+    created = store.add_products([{"name": f"P{i}", "price": i, "category": "C"} for i in range(2)])
+    assert [item["id"] for item in created] == [4, 5]
+    assert store.add_product(name="Next", price=1, category="C")["id"] == 6
+    assert store.get_statistics("C")["count"] == 3
+
+
+def test_sqlite_store_get_products_in_request_order(tmp_path):
+    store = SQLiteProductStore(str(tmp_path / "products.db"))
+    assert [item["id"] for item in store.get_products([3, 42, 1])] == [3, 1]
+
+
+def test_sqlite_store_search_follows_writes_and_reseeds(tmp_path):
+    store = SQLiteProductStore(str(tmp_path / "products.db"))
+    assert [item["id"] for item in store.search_products("смартфон")] == [2]
+
+    other = SQLiteProductStore(str(tmp_path / "products.db"))
+    other.add_product(name="Смартфон Pro", price=90000, category="Электроника")
+    assert [item["id"] for item in store.search_products("смартфон")] == [2, 4]
+
+    other.seed([Product(id=1, name="Чайник", price=2000, category="Бытовая техника", in_stock=True)])
+    assert store.search_products("смартфон") == []
+    assert [item["name"] for item in store.search_products("чайник")] == ["Чайник"]
+
+
+def test_sqlite_store_price_queries_use_the_price_order(tmp_path):
+    store = SQLiteProductStore(str(tmp_path / "products.db"))
+    store.seed([
+        Product(id=1, name="A", price=300, category="C", in_stock=True),
+        Product(id=2, name="B", price=100, category="D", in_stock=True),
+        Product(id=3, name="E", price=200, category="C", in_stock=False),
+        Product(id=4, name="F", price=200, category="C", in_stock=True),
+    ])
+    assert [p["id"] for p in store.list_products_by_price(max_price=200)] == [2, 3, 4]
+    assert [p["id"] for p in store.list_products_by_price(order="desc", limit=2)] == [1, 4]
+    assert [p["id"] for p in store.list_products_by_price(min_price=150, category="C", in_stock=True)] == [4, 1]
+    plan = store._conn.execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM products WHERE category = ? ORDER BY price, id LIMIT 1", ("C",)
+    ).fetchall()
+    assert "idx_products_category_price" in str(plan)
+
+
+def test_sqlite_store_pages_with_an_id_cursor(tmp_path):
+    store = SQLiteProductStore(str(tmp_path / "products.db"))
+    store.seed([Product(id=i, name=f"P{i}", price=i, category="C" if i % 2 else "D", in_stock=True) for i in range(1, 8)])
+    assert [p["id"] for p in store.list_products(after_id=2, limit=3)] == [3, 4, 5]
+    assert [p["id"] for p in store.list_products(category="C", after_id=3, limit=2)] == [5, 7]
+    assert store.list_products(after_id=7) == []
@@ -1,26 +1,45 @@
 from __future__ import annotations
 
+import io
 import json
+import os
+import threading
 
+import pytest
+
+from agent import jsoncodec
 from mcp_server.storage import ProductStore, Product
 
+STORE_CLASSES = [ProductStore]
+try:
+    from mcp_server.columnar import ColumnarProductStore
+except ImportError:  # NumPy is optional
+    pass
+else:
+    STORE_CLASSES.append(ColumnarProductStore)
+
+
+@pytest.fixture(params=STORE_CLASSES, ids=lambda cls: cls.__name__)
+def store_cls(request):
+    return request.param
 
-def _empty_store(tmp_path):
+
+def _empty_store(tmp_path, store_cls=ProductStore):
     file_path = tmp_path / "products.json"
     file_path.write_text("[]", encoding="utf-8")
-    return ProductStore(str(file_path))
+    return store_cls(str(file_path))
 
 
-def test_store_add_and_get(tmp_path):
-    store = _empty_store(tmp_path)
+def test_store_add_and_get(tmp_path, store_cls):
+    store = _empty_store(tmp_path, store_cls)
     created = store.add_product(name="Мышка", price=1500, category="Электроника", in_stock=True)
     fetched = store.get_product(created["id"])
     assert fetched["name"] == "Мышка"
     assert fetched["price"] == 1500
 
 
-def test_store_statistics(tmp_path):
-    store = _empty_store(tmp_path)
+def test_store_statistics(tmp_path, store_cls):
+    store = _empty_store(tmp_path, store_cls)
     store.seed([
         Product(id=1, name="A", price=100, category="C", in_stock=True),
         Product(id=2, name="B", price=300, category="C", in_stock=False),
@@ -28,3 +47,267 @@ def test_store_statistics(tmp_path):
     stats = store.get_statistics()
     assert stats["count"] == 2
     assert stats["average_price"] == 200
+
+
+def test_store_sees_writes_from_other_instances(tmp_path, store_cls):
+    first = _empty_store(tmp_path, store_cls)
+    second = store_cls(first._file_path)
+    created = first.add_product(name="Мышка", price=1500, category="Электроника")
+    assert second.get_product(created["id"])["name"] == "Мышка"
+    assert second.add_product(name="Коврик", price=500, category="Электроника")["id"] == created["id"] + 1
+
+
+
+def test_stores_sharing_a_snapshot_do_not_lose_concurrent_writes(tmp_path, store_cls):
+    first = _empty_store(tmp_path, store_cls)
+    stores = [first, store_cls(first._file_path)]
+
+    def add_many(store):
+        for _ in range(40):
+            store.add_product(name="A", price=1, category="C")
+
+    threads = [threading.Thread(target=add_many, args=(store,)) for store in stores]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    ids = [item["id"] for item in json.loads((tmp_path / "products.json").read_text(encoding="utf-8"))]
+    assert sorted(ids) == list(range(1, 81))
+
+def test_journaled_store_replays_and_compacts(tmp_path, store_cls):
+    file_path = tmp_path / "products.json"
+    file_path.write_text("[]", encoding="utf-8")
+    store = store_cls(str(file_path), journal=True, fsync_every=0, compact_threshold=3)
+    store.add_product(name="A", price=100, category="C")
+    store.add_product(name="B", price=300, category="C")
+    assert json.loads(file_path.read_text(encoding="utf-8")) == []
+    log_path = tmp_path / "products.json.log"
+    with open(log_path, "ab") as f:
+        f.write(b'{"op": "add", "pro')  # torn write from a crash
+
+    reopened = store_cls(str(file_path), journal=True, compact_threshold=3)
+    assert [p["name"] for p in reopened.list_products()] == ["A", "B"]
+    reopened.add_product(name="C", price=200, category="C")
+    assert len(json.loads(file_path.read_text(encoding="utf-8"))) == 3
+    assert log_path.read_bytes() == b""
+    stats = store_cls(str(file_path), journal=True).get_statistics()
+    assert (stats["count"], stats["average_price"]) == (3, 200)
+
+
+def test_journaled_stores_sharing_a_log_keep_each_others_entries(tmp_path, store_cls):
+    file_path = tmp_path / "products.json"
+    file_path.write_text("[]", encoding="utf-8")
+    log_path = tmp_path / "products.json.log"
+    first = store_cls(str(file_path), journal=True, compact_threshold=3)
+    second = store_cls(str(file_path), journal=True, compact_threshold=3)
+
+    first.add_product(name="A", price=100, category="C")
+    second.add_product(name="B", price=200, category="C")
+    # Another process is in the middle of an append: readers must not cut it off.
+    with open(log_path, "ab") as f:
+        f.write(b'{"op": "add", "product": {"id": 3, "name": "E", "price": 300, ')
+    assert [p["name"] for p in first.list_products()] == ["A", "B"]
+    with open(log_path, "ab") as f:
+        f.write(b'"category": "C", "in_stock": true}}\n')
+    assert [p["name"] for p in second.list_products()] == ["A", "B", "E"]
+
+    # Compaction by the first store replays what the second one appended.
+    first.add_product(name="F", price=400, category="C")
+    second.add_product(name="G", price=500, category="C")
+    expected = ["A", "B", "E", "F", "G"]
+    assert [p["name"] for p in first.list_products()] == expected
+    assert [p["name"] for p in store_cls(str(file_path), journal=True).list_products()] == expected
+    assert [p["id"] for p in second.list_products()] == [1, 2, 3, 4, 5]
+
+
+
+def test_store_version_changes_when_a_rewrite_keeps_mtime_and_size(tmp_path, store_cls):
+    first = _empty_store(tmp_path, store_cls)
+    second = store_cls(first._file_path)
+    first.seed([Product(id=1, name="A", price=100, category="C", in_stock=True)])
+    version = second.catalog_version()
+    stat = os.stat(first._file_path)
+
+    first.seed([Product(id=1, name="B", price=100, category="C", in_stock=True)])
+    os.utime(first._file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert os.path.getsize(first._file_path) == stat.st_size
+    assert second.catalog_version() != version
+    assert second.get_product(1)["name"] == "B"
+
+def test_store_list_filters_and_pages(tmp_path, store_cls):
+    store = _empty_store(tmp_path, store_cls)
+    store.seed([
+        Product(id=1, name="A", price=100, category="C", in_stock=True),
+        Product(id=2, name="B", price=300, category="D", in_stock=True),
+        Product(id=3, name="E", price=200, category="C", in_stock=False),
+    ])
+    store.add_product(name="F", price=50, category="C", in_stock=True)
+    assert [p["id"] for p in store.list_products(category="C")] == [1, 3, 4]
+    assert [p["id"] for p in store.list_products(category="C", in_stock=True)] == [1, 4]
+    assert [p["id"] for p in store.list_products(offset=1, limit=2)] == [2, 3]
+    assert store.list_products(category="missing") == []
+
+
+
+def test_store_pages_with_an_id_cursor(tmp_path, store_cls):
+    store = _empty_store(tmp_path, store_cls)
+    store.add_products([
+        {"name": f"P{i}", "price": i, "category": "C" if i % 2 else "D", "in_stock": i != 5} for i in range(1, 3000)
+    ])
+    ids, after_id = [], None
+    while True:
+        page = store.list_products(category="C", in_stock=True, limit=100, after_id=after_id)
+        ids += [p["id"] for p in page]
+        if len(page) < 100:
+            break
+        after_id = page[-1]["id"]
+    assert ids == [i for i in range(1, 3000, 2) if i != 5]
+    assert [p["id"] for p in store.list_products(after_id=2, limit=3)] == [3, 4, 5]
+    assert [p["id"] for p in store.list_products(category="D", after_id=2, limit=2)] == [4, 6]
+    assert store.list_products(after_id=2999) == []
+
+    # Catalog order is not id order here: the cursor still continues after that product.
+    store.seed([Product(id=i, name="A", price=1, category="C", in_stock=True) for i in (3, 1, 2)])
+    assert [p["id"] for p in store.list_products(after_id=3, limit=5)] == [1, 2]
+
+def test_store_statistics_by_category(tmp_path, store_cls):
+    store = _empty_store(tmp_path, store_cls)
+    store.seed([
+        Product(id=1, name="A", price=100, category="C", in_stock=True),
+        Product(id=2, name="B", price=300, category="D", in_stock=False),
+    ])
+    store.add_product(name="E", price=200, category="C", in_stock=False)
+    stats = store.get_statistics(category="C")
+    assert stats["count"] == 2
+    assert stats["average_price"] == 150
+    assert (stats["min_price"], stats["max_price"], stats["in_stock_count"]) == (100, 200, 1)
+    overall = store.get_statistics()
+    assert overall["count"] == 3
+    assert overall["categories"]["D"]["average_price"] == 300
+    assert store.get_statistics(category="missing")["count"] == 0
+
+
+def test_store_price_range(tmp_path, store_cls):
+    store = _empty_store(tmp_path, store_cls)
+    store.seed([
+        Product(id=3, name="A", price=100, category="C", in_stock=True),
+        Product(id=1, name="B", price=300, category="D", in_stock=True),
+        Product(id=2, name="E", price=200, category="C", in_stock=False),
+    ])
+    assert [p["id"] for p in store.list_products(min_price=150)] == [1, 2]
+    assert [p["id"] for p in store.list_products(category="C", max_price=150)] == [3]
+    assert store.get_product(2)["name"] == "E"
+
+
+@pytest.mark.parametrize("journal", [False, True])
+def test_store_json_snapshots_are_rebuilt_after_writes(tmp_path, store_cls, journal):
+    file_path = tmp_path / "products.json"
+    file_path.write_text("[]", encoding="utf-8")
+    store = store_cls(str(file_path), journal=journal)
+    store.add_product(name="A", price=100, category="C")
+
+    listing = store.list_products_json(category="C")
+    assert store.list_products_json(category="C") is listing
+    assert json.loads(listing) == store.list_products(category="C")
+    assert json.loads(store.get_product_json(1))["name"] == "A"
+
+    store.add_product(name="B", price=300, category="C")
+    assert [item["name"] for item in json.loads(store.list_products_json(category="C"))] == ["A", "B"]
+    assert json.loads(store.get_statistics_json("C"))["count"] == 2
+    with pytest.raises(ValueError):
+        store.get_product_json(99)
+
+
+@pytest.mark.parametrize("journal", [False, True])
+def test_store_add_products_validates_and_persists_once(tmp_path, store_cls, journal):
+    file_path = tmp_path / "products.json"
+    file_path.write_text("[]", encoding="utf-8")
+    store = store_cls(str(file_path), journal=journal)
+    items = [{"name": f"P{i}", "price": i, "category": "C"} for i in range(1, 4)]
+
+    with pytest.raises(ValueError, match="Item 1"):
+        store.add_products([items[0], {"name": "Bad", "price": -1, "category": "C"}])
+    assert store.list_products() == []
+
+    created = store.add_products(items)
+    assert [item["id"] for item in created] == [1, 2, 3]
+    assert store.add_product(name="Next", price=1, category="C")["id"] == 4
+    reloaded = store_cls(str(file_path), journal=journal)
+    assert [item["name"] for item in reloaded.list_products()] == ["P1", "P2", "P3", "Next"]
+    assert reloaded.get_statistics("C")["count"] == 4
+
+
+def test_store_get_products_keeps_request_order(tmp_path, store_cls):
+    store = _empty_store(tmp_path, store_cls)
+    store.add_products([{"name": f"P{i}", "price": i, "category": "C"} for i in range(1, 4)])
+    assert [item["id"] for item in store.get_products([3, 99, 1])] == [3, 1]
+    assert store.get_products([]) == []
+
+
+def test_store_search_is_fuzzy_and_incremental(tmp_path, store_cls):
+    store = _empty_store(tmp_path, store_cls)
+    store.add_products([
+        {"name": "Ноутбук Lenovo", "price": 50000, "category": "Электроника"},
+        {"name": "Смартфон", "price": 30000, "category": "Электроника"},
+        {"name": "Кофемашина", "price": 12000, "category": "Бытовая техника"},
+    ])
+    assert [item["id"] for item in store.search_products("НОУТБУК")] == [1]
+    assert [item["id"] for item in store.search_products("ноутбк")] == [1]
+    assert store.search_products("холодильник") == []
+
+    store.add_product(name="Ноутбук Asus", price=60000, category="Электроника")
+    assert sorted(item["id"] for item in store.search_products("ноутбук", limit=5)) == [1, 4]
+    assert len(store.search_products("ноутбук", limit=1)) == 1
+
+
+def test_store_price_index_serves_ranges_and_top_k(tmp_path, store_cls):
+    store = _empty_store(tmp_path, store_cls)
+    store.seed([
+        Product(id=1, name="A", price=300, category="C", in_stock=True),
+        Product(id=2, name="B", price=100, category="D", in_stock=True),
+        Product(id=3, name="E", price=200, category="C", in_stock=False),
+    ])
+    store.add_product(name="F", price=200, category="C")
+
+    assert [p["id"] for p in store.list_products_by_price(max_price=200)] == [2, 3, 4]
+    assert [p["id"] for p in store.list_products_by_price(order="desc", limit=2)] == [1, 4]
+    assert [p["id"] for p in store.list_products_by_price(min_price=150, category="C", in_stock=True)] == [4, 1]
+    assert store.list_products_by_price(category="missing") == []
+    with pytest.raises(ValueError):
+        store.list_products_by_price(order="random")
+
+    store.add_products([{"name": f"P{i}", "price": i, "category": "C"} for i in range(50)])
+    assert [p["price"] for p in store.list_products_by_price(category="C", limit=3)] == [0, 1, 2]
+
+
+def test_store_streams_catalog_into_compact_products(tmp_path, monkeypatch):
+    items = [
+        {"id": i, "name": f"P{i} {{x}}, \"y\"", "price": i, "category": "Кат" + "егория", "in_stock": True}
+        for i in range(1, 201)
+    ]
+    file_path = tmp_path / "products.json"
+    file_path.write_text(json.dumps(items, ensure_ascii=False, indent=2), encoding="utf-8")
+    real_iter_objects = jsoncodec.iter_objects
+    # Small chunks so that items are cut at every possible position.
+    monkeypatch.setattr(jsoncodec, "iter_objects", lambda f: real_iter_objects(f, chunk_size=7))
+
+    store = ProductStore(str(file_path))
+
+    assert store.list_products() == items
+    products = list(store._iter_products())
+    assert not hasattr(products[0], "__dict__")
+    assert products[0].category is products[-1].category
+
+
+def test_product_interns_only_string_categories(tmp_path):
+    assert Product(id=1, name="A", price=1, category=None, in_stock=True).category is None
+    store = _empty_store(tmp_path)
+    for category in (None, 5):
+        with pytest.raises(ValueError, match="category"):
+            store.add_products([{"name": "A", "price": 1, "category": category}])
+
+
+@pytest.mark.parametrize("text", ["", "{}", "[{}", "[{},", "[1, 2]", "[{}] x", "[{} {}]"])
+def test_iter_objects_rejects_malformed_arrays(text):
+    with pytest.raises(ValueError):
+        list(jsoncodec.iter_objects(io.BytesIO(text.encode()), chunk_size=2))
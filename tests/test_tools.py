@@ -1,6 +1,8 @@
 from __future__ import annotations
 
-from agent.tools import calculator, formatter
+import pytest
+
+from agent.tools import DISCOUNT_EXPRESSION, apply_discount, calculator, calculator_batch, formatter
 
 
 def test_calculator_discount():
@@ -9,3 +11,26 @@ def test_calculator_discount():
 
 def test_formatter_currency():
     assert formatter("1500", "currency").endswith("RUB")
+
+
+def test_apply_discount_matches_calculator():
+    prices = [float(price) for price in range(1, 200)]
+    expected = [calculator(f"{price} * (1 - 15 / 100)") for price in prices]
+    assert apply_discount(prices, 15) == pytest.approx(expected)
+    assert apply_discount(prices[:3], 15) == pytest.approx(expected[:3])
+
+
+def test_calculator_variables_and_batch():
+    assert calculator(DISCOUNT_EXPRESSION, {"price": 100, "percent": 15}) == 85.0
+    with pytest.raises(ValueError, match="Unknown variable: percent"):
+        calculator(DISCOUNT_EXPRESSION, {"price": 100})
+    with pytest.raises(ValueError):
+        calculator("price.real", {"price": 1})
+
+    prices = list(range(100))
+    assert calculator_batch(DISCOUNT_EXPRESSION, {"price": prices, "percent": 50}) == [p / 2 for p in prices]
+    assert calculator_batch("a - b", {"a": [3, 5], "b": [1, 2]}) == [2.0, 3.0]
+    with pytest.raises(ValueError):
+        calculator_batch("a - b", {"a": [3, 5], "b": [1]})
+    with pytest.raises(ZeroDivisionError):
+        calculator_batch("1 / x", {"x": [0] * 100})